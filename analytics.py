@@ -0,0 +1,260 @@
+from currencies import OptionPrice
+from markets import Market
+from order_types import IcebergOrder
+from structures import Structure
+import glob
+import os
+import sys
+import time
+import numpy as np
+
+# One row per client order: the client, the player's market and the outcome
+columns = {
+    'game': np.int64,
+    'structure': np.uint8,
+    'aggression': np.uint8,
+    'direction': np.uint8,
+    'size': np.int32,
+    'fair': np.float64,
+    'width': np.float64,  # NaN where the player did not quote
+    'filled': np.bool_,
+    'edge': np.float64,  # per lot to the player, NaN where not filled
+}
+# Categorical columns hold codes into these labels
+levels = {
+    'structure': tuple(Structure),
+    'aggression': IcebergOrder.aggressions,
+    'direction': IcebergOrder.directions,
+}
+
+
+class ResultsStore(object):
+    """
+    Append-only columnar store of simulated order outcomes. Rows are
+    buffered in fixed-size column arrays and written as one .npy file per
+    column per chunk of chunk_rows rows; reads memory-map the chunks, so
+    aggregations stream over any number of rows a chunk at a time and
+    never hold more than one chunk of a column in memory.
+    """
+    chunk_rows = 1 << 16
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.codes = {name: {label: code for code, label in enumerate(labels)}
+                      for name, labels in levels.items()}
+        self.num_chunks = len(glob.glob(os.path.join(path, 'game.*.npy')))
+        self.games = 0
+        if self.num_chunks:
+            games = self.load(self.num_chunks - 1, 'game')
+            self.games = int(games[-1]) + 1
+        self.new_buffer()
+
+    def new_buffer(self):
+        self.buffer = {name: np.empty(self.chunk_rows, dtype)
+                       for name, dtype in columns.items()}
+        self.rows = 0
+
+    def chunk_path(self, chunk, name):
+        return os.path.join(self.path, f'{name}.{chunk:06d}.npy')
+
+    def load(self, chunk, name):
+        return np.load(self.chunk_path(chunk, name), mmap_mode='r')
+
+    def add(self, client, order, fair, mkt, trade):
+        # Record one client order and what the player did with it
+        buffer = self.buffer
+        codes = self.codes
+        row = self.rows
+        buffer['game'][row] = self.games
+        buffer['structure'][row] = codes['structure'][client.option.structure]
+        buffer['aggression'][row] = codes['aggression'][client.aggression]
+        buffer['direction'][row] = codes['direction'][client.direction]
+        buffer['size'][row] = order.size
+        buffer['fair'][row] = fair
+        if trade is None:
+            buffer['filled'][row] = False
+            buffer['edge'][row] = np.nan
+        else:
+            buffer['filled'][row] = True
+            buffer['edge'][row] = trade.edge
+        buffer['width'][row] = (np.nan if mkt is None
+                                else float(mkt.ask) - float(mkt.bid))
+        self.rows += 1
+        if self.rows == self.chunk_rows:
+            self.flush()
+        return self
+
+    def end_game(self):
+        self.games += 1
+        return self
+
+    def extend(self, arrays):
+        # Append columns of equal length in bulk, e.g. from another store
+        n = len(arrays['game'])
+        if n:
+            self.games = max(self.games, int(arrays['game'][-1]) + 1)
+        start = 0
+        while start < n:
+            size = min(n - start, self.chunk_rows - self.rows)
+            for name, column in self.buffer.items():
+                column[self.rows:self.rows + size] = \
+                    arrays[name][start:start + size]
+            self.rows += size
+            start += size
+            if self.rows == self.chunk_rows:
+                self.flush()
+        return self
+
+    def flush(self):
+        # Write buffered rows as a new chunk
+        if self.rows == 0:
+            return self
+        for name, column in self.buffer.items():
+            np.save(self.chunk_path(self.num_chunks, name),
+                    column[:self.rows])
+        self.num_chunks += 1
+        self.new_buffer()
+        return self
+
+    def __len__(self):
+        rows = self.rows
+        for chunk in range(self.num_chunks):
+            rows += len(self.load(chunk, 'game'))
+        return rows
+
+    def chunks(self, names=None):
+        """
+        Yield dicts of column arrays a chunk at a time: memory-mapped for
+        written chunks, then views of any rows still buffered
+        """
+        if names is None:
+            names = list(columns)
+        for chunk in range(self.num_chunks):
+            yield {name: self.load(chunk, name) for name in names}
+        if self.rows:
+            yield {name: self.buffer[name][:self.rows] for name in names}
+
+    def column(self, name):
+        # A whole column in memory; prefer chunks or group_by for large stores
+        return np.concatenate([chunk[name] for chunk in self.chunks([name])])
+
+    def group_by(self, by, value=None, agg='mean', weights=None, where=None,
+                 bins=None):
+        """
+        Aggregate value over groups of one or more key columns, streaming
+        the store a chunk at a time with np.bincount over flat group
+        indices. Categorical keys group by their labels; a key given edges
+        in bins, e.g. bins={'width': [0, 0.1, 0.2]}, groups by bin as
+        (lo, hi). agg is 'count', 'sum' or 'mean', optionally weighted by
+        another column; where is a boolean column name, or a function of
+        a chunk returning a mask. Rows whose value, weight or binned key is
+        NaN are skipped. Returns {key: result} for each non-empty group,
+        keyed by label, or by a tuple of labels for several keys.
+        """
+        if isinstance(by, str):
+            by = [by]
+        bins = bins or {}
+        if agg not in ('count', 'sum', 'mean'):
+            raise KeyError('Unrecognised aggregation: ', agg)
+        if value is None and agg != 'count':
+            raise AttributeError('Aggregation needs a value: ', agg)
+        labels = []
+        for name in by:
+            if name in bins:
+                edges = np.asarray(bins[name], dtype=float)
+                labels.append([(float(lo), float(hi))
+                               for lo, hi in zip(edges[:-1], edges[1:])])
+            elif name in levels:
+                labels.append(levels[name])
+            else:
+                raise KeyError('Group by needs levels or bins: ', name)
+        shape = tuple(len(labels_) for labels_ in labels)
+        size = int(np.prod(shape))
+        names = set(by)
+        for name in (value, weights, where):
+            if isinstance(name, str):
+                names.add(name)
+        counts = np.zeros(size)
+        sums = np.zeros(size)
+        for chunk in self.chunks(sorted(names)):
+            keep = np.ones(len(chunk[by[0]]), dtype=bool)
+            if where is not None:
+                keep &= chunk[where] if isinstance(where, str) \
+                    else where(chunk)
+            codes = []
+            for name, labels_ in zip(by, labels):
+                if name in bins:
+                    code = np.searchsorted(bins[name], chunk[name],
+                                           side='right') - 1
+                    keep &= (code >= 0) & (code < len(labels_))
+                    codes.append(np.clip(code, 0, len(labels_) - 1))
+                else:
+                    codes.append(chunk[name])
+            x = w = None
+            if value is not None:
+                x = np.asarray(chunk[value], dtype=float)
+                keep &= ~np.isnan(x)
+            if weights is not None:
+                w = np.asarray(chunk[weights], dtype=float)
+                keep &= ~np.isnan(w)
+            group = np.ravel_multi_index([code[keep] for code in codes],
+                                         shape)
+            w = None if w is None else w[keep]
+            counts += np.bincount(group, weights=w, minlength=size)
+            if agg != 'count':
+                x = x[keep] if w is None else x[keep] * w
+                sums += np.bincount(group, weights=x, minlength=size)
+        if agg == 'count':
+            results = counts
+        elif agg == 'sum':
+            results = sums
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                results = sums / counts
+        grouped = {}
+        for flat in np.flatnonzero(counts).tolist():
+            index = np.unravel_index(flat, shape)
+            key = tuple(labels_[i] for labels_, i in zip(labels, index))
+            grouped[key[0] if len(key) == 1 else key] = float(results[flat])
+        return grouped
+
+
+def jittered_market(order, sim):
+    # Quote around fair at a random whole number of ticks wide, from two
+    # ticks up to the widest legal market, to spread fills over widths
+    fair = sim.fair(order.option)
+    tick = OptionPrice.infer_tick_size(fair)
+    max_width = Market.infer_max_width(fair -
+                                       0.5 * Market.infer_max_width(fair))
+    ticks = sim.rng.integers(2, round(max_width / tick) + 1)
+    return Market.from_price(fair, width=ticks * tick)
+
+
+if __name__ == '__main__':
+    import tempfile
+    from simulation import Simulation
+    num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as path:
+        store = ResultsStore(path)
+        sim = Simulation(jittered_market, seed=0, store=store)
+        start = time.perf_counter()
+        for _ in sim.run(num_games):
+            pass
+        store.flush()
+        elapsed = time.perf_counter() - start
+        print(f'{len(store)} orders from {num_games} games in {elapsed:.2f}s')
+        start = time.perf_counter()
+        edges = store.group_by(['structure', 'aggression'], 'edge',
+                               weights='size', where='filled')
+        fill_rates = store.group_by('width', 'filled',
+                                    bins={'width': [0, 0.1, 0.2, 0.4, 0.8,
+                                                    1.6]})
+        elapsed = time.perf_counter() - start
+        print('Edge per lot by structure and aggression:')
+        for (structure, aggression), edge in edges.items():
+            print(f'    {str(structure):<15} {aggression:>5.2f} {edge:>8.3f}')
+        print('Fill rate by market width:')
+        for (lo, hi), rate in fill_rates.items():
+            print(f'    {lo:.2f}-{hi:.2f} {rate:>8.1%}')
+        print(f'Group-bys in {1e3 * elapsed:.1f}ms')
@@ -0,0 +1,296 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+
+def best(func, number, repeat=5):
+    # Best total time over several timing runs
+    return min(timeit.repeat(func, number=number, repeat=repeat))
+
+
+def report(name, seconds, number, unit='us'):
+    scale = {'us': 1e6, 'ns': 1e9}[unit]
+    print(f'{name:<40} {scale * seconds / number:>10.2f} {unit}/op')
+
+
+def live_bytes(make, n=100000):
+    # Bytes allocated per object while n of them are alive
+    tracemalloc.start()
+    objs = [make(i) for i in range(n)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objs
+    return size / n
+
+
+def value_types():
+    """
+    Allocation and per-operation cost of the Price/Market/Order value types
+    """
+    from currencies import Price
+    from markets import Market
+    from order_types import Order, Direction
+    number = 200000
+    p = Price(1.23)
+    q = Price(4.56)
+    print(f'{"Price bytes/object":<40} {live_bytes(Price):>10.1f}')
+    print(f'{"Price + number bytes/result":<40} '
+          f'{live_bytes(lambda i: p + i):>10.1f}')
+    report('Price(x)', best(lambda: Price(1.23), number=number),
+           number, 'ns')
+    report('Price + Price', best(lambda: p + q, number=number),
+           number, 'ns')
+    report('Price * float', best(lambda: p * 2.0, number=number),
+           number, 'ns')
+    report('Price.round', best(p.round, number=number),
+           number, 'ns')
+    report('Market.from_price',
+           best(lambda: Market.from_price(4.13), number=number // 4),
+           number // 4, 'ns')
+    report('Order(...)',
+           best(lambda: Order(None, Direction.BUY, 4.13, 100),
+                number=number // 4),
+           number // 4, 'ns')
+
+
+def cold_start(module, runs=5):
+    # Median wall time of a fresh interpreter importing module
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = ('import time; t = time.perf_counter(); '
+            f'import {module}; print(time.perf_counter() - t)')
+    times = [float(subprocess.check_output([sys.executable, '-c', code],
+                                           cwd=here))
+             for _ in range(runs)]
+    return statistics.median(times)
+
+
+def startup():
+    """
+    Cold-start import time of each entry point and library module
+    """
+    modules = ['game', 'user_input', 'boards', 'game_logging', 'sounds',
+               'order_types', 'structures', 'markets', 'currencies',
+               'pricing', 'expiries', 'settings']
+    for module in modules:
+        print(f'{"import " + module:<40} '
+              f'{1e3 * cold_start(module):>10.1f} ms')
+
+
+def order_book(n=200000):
+    """
+    Order book throughput: adds, cancels and crossing orders per second
+    """
+    import random
+    from matching import OrderBook
+    from order_types import Direction
+    rng = random.Random(0)
+    book = OrderBook()
+    flow = []
+    for _ in range(n):
+        dirn = rng.choice([Direction.BUY, Direction.SELL])
+        # Bids and offers share one price range so many orders cross
+        price = round(1 + 0.05 * rng.randint(-10, 10), 2)
+        flow.append((rng.random(), dirn, price, rng.choice([10, 50, 100])))
+    live = []
+    fills = 0
+    start = time.perf_counter()
+    for u, dirn, price, size in flow:
+        if u < 0.2 and live:
+            book.cancel(live.pop(rng.randrange(len(live))))
+        elif u < 0.3:
+            order_id, filled = book.add(dirn, price, 5 * size, peak=size)
+            live.append(order_id)
+            fills += len(filled)
+        else:
+            order_id, filled = book.add(dirn, price, size)
+            live.append(order_id)
+            fills += len(filled)
+    elapsed = time.perf_counter() - start
+    print(f'{"orders/s":<40} {n / elapsed:>10.0f}')
+    print(f'{"fills/s":<40} {fills / elapsed:>10.0f}')
+    print(f'{"resting orders at end":<40} {len(book.orders):>10d}')
+
+
+def audio_latency(runs=50):
+    """
+    Latency from pressing enter (requesting a countdown) to the first tick
+    """
+    import sounds
+    sounds.set_backend(sounds.SilentBackend())
+    scheduler = sounds.scheduler
+    scheduler.ensure_running()
+    delays = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        scheduler.countdown(1, verbose=False).result()
+        delays.append(time.perf_counter() - start)
+        scheduler.drain()
+    delays.sort()
+    print(f'{"player":<40} {type(scheduler.player).__name__:>10}')
+    print(f'{"enter to first tick p50":<40} '
+          f'{1e3 * delays[len(delays) // 2]:>10.2f} ms')
+    print(f'{"enter to first tick max":<40} {1e3 * delays[-1]:>10.2f} ms')
+    for name, value in scheduler.latency_report().items():
+        print(f'{"scheduler " + name:<40} {value:>10.2f}')
+
+
+def simulation(num_games=2000):
+    """
+    Headless games per second for the built-in strategies
+    """
+    from simulation import Simulation, fair_market, pass_market, summarise
+    for strategy in [fair_market, pass_market]:
+        sim = Simulation(strategy, seed=0)
+        sim.play()
+        start = time.perf_counter()
+        stats = summarise(sim.run(num_games))
+        elapsed = time.perf_counter() - start
+        print(f'{strategy.__name__ + " games/s":<40} '
+              f'{num_games / elapsed:>10.0f}')
+        print(f'{strategy.__name__ + " orders/s":<40} '
+              f'{stats["orders/game"] * num_games / elapsed:>10.0f}')
+
+
+def render(frames=2000):
+    """
+    Board redraw cost: diffed ANSI frames against full __str__ redraws
+    """
+    import io
+    from boards import MarketBoard
+    from rendering import BoardRenderer
+    board = MarketBoard()
+    out = io.StringIO()
+    renderer = BoardRenderer(board, out)
+    renderer.draw()
+    moves = [0.05, -0.05] * (frames // 2)
+    elapsed = 0
+    for dS in moves:
+        # Tick the board between frames so every frame has changes
+        board.reprice(dS, taylor=True)
+        start = time.perf_counter()
+        renderer.draw()
+        elapsed += time.perf_counter() - start
+    diff_bytes = len(out.getvalue())
+    start = time.perf_counter()
+    full_bytes = sum(len(str(board)) for _ in moves)
+    full = time.perf_counter() - start
+    print(f'{"diffed frames/s":<40} {frames / elapsed:>10.0f}')
+    print(f'{"full __str__ frames/s":<40} {frames / full:>10.0f}')
+    print(f'{"diffed bytes/frame":<40} {diff_bytes / frames:>10.1f}')
+    print(f'{"full bytes/frame":<40} {full_bytes / frames:>10.1f}')
+
+
+def bot_decision(ticks=2000):
+    """
+    DeltaBot decision step per tick over a full board, for a 5 strike and
+    a 21 strike ladder
+    """
+    import settings
+    from boards import MarketBoard
+    from bot import DeltaBot
+    from paths import GBM, drive
+    for strikes in [5, 21]:
+        with settings.board.overriding(strikes=strikes):
+            board = MarketBoard()
+        bot = DeltaBot(board)
+        bot.tick()
+        elapsed = 0
+        count = 0
+        for _ in drive(board, GBM(settings.board.vol), ticks, seed=0):
+            start = time.perf_counter()
+            bot.decide()
+            elapsed += time.perf_counter() - start
+            count += 1
+        name = f'decide, {len(bot.options)} candidates'
+        report(name, elapsed, count)
+
+
+def session_replay(num_orders=20000):
+    """
+    Recording cost per event and headless replay speed for a session of
+    client orders, half filled by the player and half rested in the book
+    """
+    import tempfile
+    from boards import PublicBoard
+    from game_logging import Recorder, read_events
+    from markets import Market
+    from order_types import Direction, IcebergOrder
+    from replay import Replay
+    with tempfile.TemporaryDirectory() as dir_name:
+        recorder = type('BenchRecorder', (Recorder,),
+                        {'dir_name': dir_name})()
+        board = PublicBoard()
+        recorder.start(0, board.fair)
+        clients = IcebergOrder.rand_many(board.fair, num_orders, 0)
+        orders = [client.pop() for client in clients]
+        markets = {order.option: Market.from_price(order.option.get_price())
+                   for order in orders}
+        start = time.perf_counter()
+        for i, order in enumerate(orders):
+            recorder.quote(order)
+            if i % 2:
+                recorder.market(order.option, markets[order.option])
+                recorder.fill(order.option, -order.direction,
+                              markets[order.option].bid, order.size)
+            else:
+                recorder.rest(order)
+        recorder.close()
+        elapsed = time.perf_counter() - start
+        num_events = recorder.num_events
+        report('record event', elapsed, num_events)
+        size = os.path.getsize(recorder.events_path)
+        print(f'{"bytes/event":<40} {size / num_events:>10.1f}')
+        start = time.perf_counter()
+        Replay(recorder.events_path).run()
+        elapsed = time.perf_counter() - start
+        print(f'{"replayed events/s":<40} {num_events / elapsed:>10.0f}')
+        start = time.perf_counter()
+        next(read_events(recorder.events_path, num_events - 1))
+        report('seek to last event', time.perf_counter() - start, 1)
+
+
+def results_store(num_games=1000, num_rows=5 * 10 ** 6):
+    """
+    Recording simulated orders into the columnar results store, and
+    streamed group-bys once it is bulk-extended to num_rows rows
+    """
+    import tempfile
+    from analytics import ResultsStore, columns, jittered_market
+    from simulation import Simulation
+    with tempfile.TemporaryDirectory() as path:
+        store = ResultsStore(os.path.join(path, 'games'))
+        sim = Simulation(jittered_market, seed=0, store=store)
+        start = time.perf_counter()
+        for _ in sim.run(num_games):
+            pass
+        elapsed = time.perf_counter() - start
+        print(f'{"games/s recorded":<40} {num_games / elapsed:>10.0f}')
+        arrays = {name: store.column(name) for name in columns}
+        big = ResultsStore(os.path.join(path, 'big'))
+        while len(big) < num_rows:
+            arrays['game'] += num_games
+            big.extend(arrays)
+        big.flush()
+        rows = len(big)
+        start = time.perf_counter()
+        big.group_by(['structure', 'aggression'], 'edge', weights='size',
+                     where='filled')
+        report('edge by structure, aggression / row',
+               time.perf_counter() - start, rows, 'ns')
+        start = time.perf_counter()
+        big.group_by('width', 'filled', bins={'width': [0, 0.2, 0.4, 0.8]})
+        report('fill rate by width / row', time.perf_counter() - start,
+               rows, 'ns')
+
+
+if __name__ == '__main__':
+    benchmarks = {name: func for name, func in list(globals().items())
+                  if callable(func) and func.__doc__}
+    names = sys.argv[1:] or list(benchmarks)
+    for name in names:
+        print(f'--- {name}')
+        benchmarks[name]()
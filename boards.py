@@ -1,15 +1,17 @@
 from currencies import Price
 from markets import Market
+from columns import PriceColumn, MarketColumn
 from strings import spaces
 from structures import Option, Structure
 from expiries import years_to_expiry
-from scipy.stats import norm
+from matching import OrderBook
+from pricing import PV, VolSmile, strike_grid, black_scholes, leg_greeks
+from pricing import smile_adjusted
 import numpy as np
 import pandas as pd
 import copy
-import yaml
+import settings
 
-Phi = norm.cdf
 opttypes = ["call", "put", "put&stock", "buywrite"]
 
 
@@ -18,80 +20,124 @@ class Board(object):
 
     def PV(self, arr):
         # Get Present Value
-        return arr * np.exp(-self.rate * self.expiry)
+        return PV(arr, self.rate, self.expiry)
 
     def copy(self):
         return copy.deepcopy(self)
 
     def loc(self, strike, opt):
+        # Value at a strike
         return self.df.loc[strike, opt]
 
     def iloc(self, row, col):
-        strike = self.get_strikes(self.S)[row]
-        return self.df.loc[strike, col]
+        # Value at a row position, counting from the lowest strike
+        return self.df.loc[self.df.index[row], col]
+
+    def set_loc(self, strike, col, value):
+        self.df.loc[strike, col] = value
+
+    def set_iloc(self, row, col, value):
+        self.df.loc[self.df.index[row], col] = value
 
     def pos(self, iterable):
         strike, opt = iterable
         return self.ix(strike, opt)
 
     def __getitem__(self, key):
-        if len(key) == 1:
+        # Columns by name, or values by (strike, column); use iloc for rows
+        if isinstance(key, str):
             return self.df[key]
-        row, col = key
-        if row < 5:
-            return self.iloc(row, col)
-        else:
-            return self.loc(row, col)
+        strike, col = key
+        return self.loc(strike, col)
 
     def __setitem__(self, key, value):
-        if len(key) == 1:
+        if isinstance(key, str):
             self.df[key] = value
-        row, col = key
-        if row < 5:
-            strike = self.get_strikes()[row]
-        else:
-            strike = row
-        self.df.loc[strike, col] = value
+            return
+        strike, col = key
+        self.set_loc(strike, col, value)
 
     def get_strikes(self, S=None):
+        # Ladder of num_strikes centred on ATM, cut off at zero
+        if S is None:
+            S = self.S
+        box = int(self.box)
+        strikes = strike_grid(float(S), box, self.num_strikes).astype(int)
+        return strikes[strikes > 0].tolist()
+
+    def atm_row(self, S=None, strikes=None):
+        # Row of the at-the-money strike
         if S is None:
             S = self.S
+        if strikes is None:
+            strikes = self.df.index
         box = int(self.box)
-        atm = int(Price(S, box).round())
-        return [atm - 2 * box, atm - box, atm, atm + box, atm + 2 * box]
+        atm = box * round(float(S) / box)
+        row = int(np.searchsorted(np.asarray(strikes), atm))
+        return min(row, len(strikes) - 1)
 
     def get_rc(self, S):
-        K = np.array(self.get_strikes(S))
-        return Price(np.mean(K - self.PV(K)))
+        # Carry on the ATM strike, the mean over a symmetric ladder
+        box = int(self.box)
+        K = box * round(float(S) / box)
+        return Price(K - self.PV(K))
+
+    def leg_values(self):
+        # Call then put prices at each strike as one float vector, the
+        # columns of structures.structure_weights
+        return np.concatenate([np.asarray(self.df[col].array, dtype=float)
+                               for col in ("call", "put")])
 
     def get_straddle(self):
-        atm = self.df.index[2]
+        atm = self.df.index[self.atm_row()]
         return Option(atm, Structure.STRADDLE, self)
 
-    def infer_board_as_df(self, S):
-        # Infer dataframe of option Prices from stock price using Black-Scholes
-        sigma = self.sigma
-        t = self.expiry
-        r = self.rate
-        strikes = self.get_strikes(S)
-        K = np.array(strikes)
-        rc = self.get_rc(S)
-        df = pd.DataFrame(columns=["call", "strike", "put", "put&stock",
-                                   "buywrite", "callspread", "calldelta"])
-        d_plus = np.log(S / K)
-        d_plus += (r + 0.5 * (sigma ** 2)) * t
-        d_plus /= sigma * np.sqrt(t)
-        d_minus = d_plus - sigma * np.sqrt(t)
-        df["calldelta"] = 100 * Phi(d_plus)
-        df["call"] = Phi(d_plus) * S - Phi(d_minus) * self.PV(K)
-        df["put"] = Phi(-d_minus) * self.PV(K) - Phi(-d_plus) * S
-        df["callspread"] = df.call - df.call.shift(-1)
-        df["put&stock"] = df.call - rc
-        df["buywrite"] = df.put + rc
-        df["strike"] = strikes
-        df = df.set_index("strike")
-        df = df.applymap(Price)
-        df.calldelta = df.calldelta.map(int)
+    def get_sigmas(self, S, strikes=None):
+        # Smile vol at each strike for the forward implied by S
+        if strikes is None:
+            strikes = self.get_strikes(S)
+        forward = float(S) * np.exp(self.rate * self.expiry)
+        return self.smile(np.array(strikes, dtype=float), self.expiry,
+                          forward)
+
+    def infer_grid(self, S, strikes=None):
+        # Raw Black-Scholes arrays over the board strikes, with delta and
+        # gamma taking in the smile's move with spot
+        if strikes is None:
+            strikes = self.get_strikes(S)
+        S = float(S)
+        K = np.array(strikes, dtype=float)
+        forward = S * np.exp(self.rate * self.expiry)
+        sigma = self.smile(K, self.expiry, forward)
+        grid = black_scholes(S, K, sigma, self.rate, self.expiry)
+        if self.smile.is_flat():
+            return grid
+        slope, curve = self.smile.forward_slopes(K, self.expiry, forward)
+        return smile_adjusted(grid, S, K, sigma, self.rate, self.expiry,
+                              slope, curve)
+
+    def infer_columns(self, grid, rc):
+        # Board columns implied by call/put prices and r/c
+        rc = float(rc)
+        callspread = grid.call - np.append(grid.call[1:], np.nan)
+        return {"call": grid.call,
+                "put": grid.put,
+                "put&stock": grid.call - rc,
+                "buywrite": grid.put + rc,
+                "callspread": callspread}
+
+    def infer_board_as_df(self, S, strikes=None, grid=None):
+        # Infer dataframe of option Prices from stock price using
+        # Black-Scholes, or from an already priced grid over strikes
+        if strikes is None:
+            strikes = self.get_strikes(S)
+        if grid is None:
+            grid = self.infer_grid(S, strikes)
+        columns = self.infer_columns(grid, self.get_rc(S))
+        df = pd.DataFrame({col: PriceColumn.from_floats(prices)
+                           for col, prices in columns.items()},
+                          index=pd.Index(strikes, name="strike"))
+        df["calldelta"] = (100 * grid.calldelta).astype(int)
         return df
 
     def __repr__(self):
@@ -107,27 +153,96 @@ class Board(object):
 
 class PriceBoard(Board):
     # A board of Prices
+    # Largest spot move, as a fraction of spot, repriced by Taylor expansion
+    max_taylor_move = 0.01
 
-    def __init__(self, S=None):
-        with open('configs/board.yml', 'r') as stream:
-            try:
-                configs = yaml.load(stream)
-            except yaml.YAMLError as e:
-                print(e)
-        self.rate = configs['int']
-        self.sigma = configs['vol']
-        self.expiry = years_to_expiry()
-        self.box = configs['box']
+    def __init__(self, S=None, expiry=None):
+        configs = settings.board
+        self.rate = configs.rate
+        # ATM vol; per-strike vols come from the smile
+        self.sigma = configs.vol
+        self.smile = VolSmile.from_settings(configs)
+        if expiry is None:
+            expiry = years_to_expiry()
+        self.expiry = expiry
+        self.box = configs.box
+        self.num_strikes = configs.strikes
         if S is None:
-            S = configs['stock']
+            S = configs.stock
         self.S = Price(S)
         self.rc = self.get_rc(S)
-        self.df = self.infer_board_as_df(S)
+        strikes = self.get_strikes(S)
+        self.grid = self.infer_grid(S, strikes)
+        self.anchor = (float(S), self.grid)
+        self.df = self.infer_board_as_df(S, strikes, self.grid)
         self.V = self.get_straddle().get_price()
 
+    def update_spot(self, S, taylor=False):
+        """
+        Reprice the board in place for a new stock price. The strike grid
+        is only re-rolled when ATM crosses a box boundary. With taylor=True,
+        small moves from the last exact pricing use a delta/gamma expansion,
+        whose smile-adjusted Greeks follow the same smile dynamic as exact
+        repricing: the smile moves with the forward.
+        Returns True if the strikes changed.
+        """
+        S = float(S)
+        strikes = self.get_strikes(S)
+        rerolled = strikes != self.df.index.tolist()
+        S0, grid0 = self.anchor
+        dS = S - S0
+        if rerolled:
+            self.rc = self.get_rc(S)
+            grid = self.infer_grid(S, strikes)
+            self.anchor = (S, grid)
+            self.df = self.infer_board_as_df(S, strikes, grid)
+        elif taylor and abs(dS) <= self.max_taylor_move * S0:
+            convexity = 0.5 * grid0.gamma * dS ** 2
+            grid = grid0._replace(
+                call=grid0.call + grid0.calldelta * dS + convexity,
+                put=grid0.put + (grid0.calldelta - 1) * dS + convexity,
+                calldelta=grid0.calldelta + grid0.gamma * dS)
+            # Vega and theta stay at their anchor values to first order
+        else:
+            grid = self.infer_grid(S, strikes)
+            self.anchor = (S, grid)
+        if not rerolled:
+            for col, prices in self.infer_columns(grid, self.rc).items():
+                self.df[col].array.update(prices)
+            self.df["calldelta"] = (100 * grid.calldelta).astype(int)
+        self.S = Price(S)
+        self.grid = grid
+        # ATM straddle straight from the grid rather than via the dataframe
+        atm = self.atm_row(S, strikes)
+        self.V = Price(grid.call[atm] + grid.put[atm])
+        return rerolled
+
+    def reprice(self, dS, taylor=False):
+        # Reprice the board in place for a stock price move of dS
+        return self.update_spot(float(self.S) + dS, taylor)
+
+    def leg_greeks(self):
+        # Greeks of the calls then puts, rows matching leg_values
+        return leg_greeks(self.grid)
+
+    def greeks(self):
+        # Per-strike Greeks of the current pricing pass; delta and gamma
+        # include the smile moving with spot
+        grid = self.grid
+        return pd.DataFrame({"sigma": self.get_sigmas(self.S),
+                             "calldelta": grid.calldelta,
+                             "putdelta": grid.calldelta - 1,
+                             "gamma": grid.gamma,
+                             "vega": grid.vega,
+                             "calltheta": grid.calltheta,
+                             "puttheta": grid.puttheta},
+                            index=self.df.index)
+
 
 class MarketBoard(Board):
     # A board of markets, tied to a Price Board
+    # Strikes either side of ATM shown when printing the board
+    window = 2
 
     def __init__(self, S=None, board=None):
         if S is not None and board is not None:
@@ -141,18 +256,56 @@ class MarketBoard(Board):
         else:
             board = PriceBoard(S)
         df = board.df.copy()
-        for op in opttypes:
-            df[op] = df[op].map(Market.from_price)
+        self.quote(df, board.df)
         self.S = Market.from_price(board.S, width=.20)
         self.V = Market.from_price(board.V, width=.30)
         self.box = board.box
+        self.num_strikes = board.num_strikes
         self.rc = board.rc
         self.df = df
         self.fair = board
-        self.bot_orders = {}
+        self.books = {}
+        # Called with the fills whenever an appended order trades
+        self.fill_listeners = []
+
+    def update_spot(self, S, taylor=False):
+        # Move the fair board in place, resync fair columns and strikes
+        # and requote the markets off the moved fair prices
+        fair = self.fair
+        rerolled = fair.update_spot(S, taylor)
+        if rerolled:
+            self.df = self.df.reindex(fair.df.index)
+        self.df["callspread"] = fair.df["callspread"].copy()
+        self.df["calldelta"] = fair.df["calldelta"]
+        self.S = Market.from_price(fair.S, width=.20)
+        self.V = Market.from_price(fair.V, width=.30)
+        self.rc = fair.rc
+        self.requote()
+        return self
+
+    def reprice(self, dS, taylor=False):
+        # Move the fair board in place by dS
+        return self.update_spot(float(self.fair.S) + dS, taylor)
+
+    @staticmethod
+    def quote(df, fair_df):
+        # Markets around every fair option price
+        for op in opttypes:
+            df[op] = MarketColumn.from_price(fair_df[op].array)
+
+    def requote(self):
+        # Spot moved: requote every market off the fair board
+        self.quote(self.df, self.fair.df)
+        return self
+
+    def window_rows(self):
+        # Rows shown on screen: window strikes either side of ATM
+        atm = self.atm_row()
+        return (max(atm - self.window, 0),
+                min(atm + self.window + 1, len(self.df.index)))
 
     def __str__(self):
-        # Prettified string representation of options board
+        # Prettified string representation of the visible window
         s = chr(27) + "[2J"
         s += self.get_stock_and_rc()
         s += "\n"
@@ -160,20 +313,25 @@ class MarketBoard(Board):
         s += "PutsAndStock        Call        "
         s += "|  Strike   |"
         s += "        Put         Buywrite"
-        for strike, row in self.df.iterrows():
+        lo, hi = self.window_rows()
+        strikes = self.df.index[lo:hi].tolist()
+        cols = {col: self.df[col].array[lo:hi]
+                for col in ["put&stock", "call", "put", "buywrite",
+                            "callspread"]}
+        for i, strike in enumerate(strikes):
             s += "\n"
             s += spaces(7)
-            rowarray = [row["put&stock"],
-                        row["call"],
+            rowarray = [cols["put&stock"][i],
+                        cols["call"][i],
                         "|",
                         "{:3d}".format(strike),
                         "|",
-                        row["put"],
-                        row["buywrite"]]
+                        cols["put"][i],
+                        cols["buywrite"][i]]
             rowstrs = map(str, rowarray)
             s += spaces(4).join(rowstrs)
-            if strike != self.df.index[-1]:
-                s += "\n{}<".format(row["callspread"])
+            if i < len(strikes) - 1:
+                s += "\n{}<".format(cols["callspread"][i])
         s += f"\n{self.get_straddle()}: {self.V}"
         if self.bot_orders:
             s += "\n"
@@ -182,34 +340,55 @@ class MarketBoard(Board):
 
     def clear(self):
         for op in opttypes:
-            self.df[op] = self.df[op].map(lambda mkt: mkt.nullify())
+            self.df[op] = self.df[op].array.nullify()
         return self
 
     def make_babies(self):
-        bw_pos = (0, 'buywrite')
-        pns_pos = (-1, 'put&stock')
-        call_fair = self.fair[pns_pos]
-        put_fair = self.fair[bw_pos]
-        self[bw_pos] = Market.from_price(put_fair, width=.2)
-        self[pns_pos] = Market.from_price(call_fair, width=.2)
+        # Markets in the deepest visible buywrite and put&stock
+        lo, hi = self.window_rows()
+        put_fair = self.fair.iloc(lo, 'buywrite')
+        call_fair = self.fair.iloc(hi - 1, 'put&stock')
+        self.set_iloc(lo, 'buywrite', Market.from_price(put_fair, width=.2))
+        self.set_iloc(hi - 1, 'put&stock',
+                      Market.from_price(call_fair, width=.2))
         return self
 
+    def book(self, option):
+        # Order book for an option, created on first use
+        if option not in self.books:
+            self.books[option] = OrderBook(option)
+        return self.books[option]
+
+    @property
+    def bot_orders(self):
+        # Best resting bot bid and offer in each book
+        return {(order.option, order.direction): order
+                for book in self.books.values()
+                for order in book.top_orders()}
+
     def append(self, order):
-        opt = order.option
-        dirn = order.direction
-        key = (opt, dirn)
-        if key in self.bot_orders.keys():
-            self.bot_orders[key] += order
-        else:
-            self.bot_orders[key] = order
+        """
+        Match a bot order against its option's book, resting what is
+        left. Any fills are passed to each of fill_listeners, e.g. a
+        DeltaBot whose resting order was hit, and returned
+        """
+        order_id, fills = self.book(order.option).add_order(order)
+        if fills:
+            for listener in self.fill_listeners:
+                listener(fills)
+        return fills
 
 
 class PublicBoard(MarketBoard):
 
-    def __init__(self):
-        MarketBoard.__init__(self)
+    def __init__(self, board=None):
+        MarketBoard.__init__(self, board=board)
         self = self.clear().make_babies()
 
+    def requote(self):
+        # Only the babies are shown, at the edges of the current window
+        return self.clear().make_babies()
+
 
 if __name__ == "__main__":
     print(PriceBoard())
@@ -0,0 +1,195 @@
+from collections import namedtuple
+from columns import infer_max_widths, option_tick_sizes, round_to_tick
+from ledger import Ledger
+from order_types import Direction, Order
+from paths import seconds_per_year
+from structures import Option, Structure, StructurePricer, strike_sets
+import time
+import numpy as np
+
+# Arrays over every candidate structure from one decision step
+Decision = namedtuple('Decision', ['direction', 'price', 'size', 'edge',
+                                   'chosen'])
+
+
+def candidate_options(board):
+    # Every structure at every valid set of the board's strikes
+    strikes = board.df.index.tolist()
+    return [Option(list(combo), struct, board)
+            for struct in Structure
+            for combo in strike_sets(struct, strikes)]
+
+
+class DeltaBot(object):
+    """
+    Trades a view on the stock: each tick every structure/strike candidate
+    on the board is scored in one batched array pass, as its expected P&L
+    per lot from delta, gamma and theta over the horizon for the expected
+    spot move, less what the bot concedes on price to get filled. Delta
+    and gamma take in the smile's move with spot. The best few that fit
+    inside the delta and vega limits are sent to the MarketBoard's order
+    books, replacing the bot's previous orders.
+    """
+    # Expected spot move is momentum (EWMA of spot changes) times horizon
+    horizon = 20
+    momentum_decay = 0.9
+    min_edge = 0.02
+    clip = 100
+    lot = 10
+    max_orders = 3
+    max_delta = 500.0
+    max_vega = 2000.0
+
+    def __init__(self, board, view=None, **limits):
+        for name, value in limits.items():
+            if not hasattr(type(self), name):
+                raise KeyError('Unrecognised bot setting: ', name)
+            setattr(self, name, value)
+        self.board = board
+        self.fixed_view = view
+        self.momentum = 0.0
+        self.last_spot = None
+        self.ledger = Ledger()
+        self.live = {}
+        self.options = None
+        self.pricer = None
+        # Hear about fills when other orders trade against the bot's
+        board.fill_listeners.append(self.on_fills)
+
+    def observe(self, S):
+        # Update the momentum signal from a new spot
+        S = float(S)
+        if self.last_spot is not None:
+            decay = self.momentum_decay
+            self.momentum = decay * self.momentum + (1 - decay) * (
+                S - self.last_spot)
+        self.last_spot = S
+
+    def view(self):
+        if self.fixed_view is not None:
+            return self.fixed_view
+        return self.momentum * self.horizon
+
+    def ensure_candidates(self):
+        # Candidates follow the fair board's strikes when they roll
+        fair = self.board.fair
+        if self.pricer is None or self.pricer.df is not fair.df:
+            self.options = candidate_options(fair)
+            self.pricer = StructurePricer(self.options, fair)
+        return self.pricer
+
+    def decide(self):
+        """
+        Score every candidate and choose orders; returns a Decision of
+        arrays aligned with self.options
+        """
+        pricer = self.ensure_candidates()
+        fair = pricer.prices()
+        greeks = pricer.greeks()
+        delta, gamma, vega, theta = greeks.T
+        move = self.view()
+        dt = self.horizon / seconds_per_year
+        expected = delta * move + 0.5 * gamma * move ** 2 + theta * dt
+        dirn = np.where(expected >= 0, 1, -1)
+        # Concede up to half a max-width market, keeping min_edge per lot
+        half_width = 0.5 * infer_max_widths(np.abs(fair))
+        concession = np.clip(np.abs(expected) - self.min_edge, 0, half_width)
+        price = round_to_tick(fair + dirn * concession,
+                              option_tick_sizes(np.abs(fair)))
+        edge = np.abs(expected) - dirn * (price - fair)
+        # Lots each candidate could take alone before breaching a limit
+        mark = self.ledger.mark(self.board.fair)
+        changes = (dirn * delta, dirn * vega)
+        limits = (self.max_delta, self.max_vega)
+        held = [mark.delta, mark.vega]
+        size = self.sizes(changes, held, limits)
+        # Choose the best candidate, then resize the rest within the limits
+        # it leaves, so the chosen orders fit the limits together
+        chosen = []
+        room = size
+        for _ in range(self.max_orders):
+            score = np.where((edge >= self.min_edge) & (room > 0),
+                             edge * room, -np.inf)
+            score[chosen] = -np.inf
+            best = int(np.argmax(score))
+            if not np.isfinite(score[best]):
+                break
+            size[best] = room[best]
+            chosen.append(best)
+            for k, change in enumerate(changes):
+                held[k] += room[best] * change[best]
+            room = self.sizes(changes, held, limits)
+        return Decision(dirn, price, size, edge, np.array(chosen, dtype=int))
+
+    def sizes(self, changes, held, limits):
+        # Whole lots, up to clip, that keep each position within its limit
+        size = np.float64(self.clip)
+        for change, position, limit in zip(changes, held, limits):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                room = np.where(change > 0, limit - position,
+                                limit + position)
+                room = np.where(change != 0, room / np.abs(change), np.inf)
+            size = np.minimum(size, np.maximum(room, 0))
+        return self.lot * np.floor(size / self.lot)
+
+    def orders(self, decision):
+        return [Order(self.options[i], Direction(int(decision.direction[i])),
+                      float(decision.price[i]), int(decision.size[i]))
+                for i in decision.chosen.tolist()]
+
+    def cancel(self):
+        # Pull every resting bot order
+        for (option, order_id), direction in self.live.items():
+            self.board.book(option).cancel(order_id)
+        self.live = {}
+
+    def submit(self, orders):
+        # Send orders to the board's books, recording any immediate fills
+        for order in orders:
+            book = self.board.book(order.option)
+            order_id, fills = book.add_order(order)
+            for fill in fills:
+                self.ledger.record(order.option, order.direction, fill.price,
+                                   fill.size)
+            if order_id in book.orders:
+                self.live[(order.option, order_id)] = order.direction
+        return self
+
+    def on_fills(self, fills):
+        # Record fills where another order traded against a bot order
+        for fill in fills:
+            direction = self.live.get((fill.option, fill.maker_id))
+            if direction is not None:
+                self.ledger.record(fill.option, direction, fill.price,
+                                   fill.size)
+
+    def tick(self):
+        # One decision step on the current board: requote the best trades
+        self.observe(self.board.fair.S)
+        decision = self.decide()
+        self.cancel()
+        orders = self.orders(decision)
+        self.submit(orders)
+        return orders
+
+
+if __name__ == '__main__':
+    from boards import MarketBoard
+    from paths import GBM, drive
+    import settings
+    board = MarketBoard()
+    bot = DeltaBot(board)
+    decide = 0
+    ticks = 0
+    start = time.perf_counter()
+    for _ in drive(board, GBM(settings.board.vol), 20000, seed=0):
+        t = time.perf_counter()
+        bot.tick()
+        decide += time.perf_counter() - t
+        ticks += 1
+    elapsed = time.perf_counter() - start
+    print(f'{ticks} ticks in {elapsed:.2f}s, '
+          f'{1e6 * decide / ticks:.0f}us per decision step')
+    print(f'{len(bot.options)} candidates, resting orders:')
+    for order in board.bot_orders.values():
+        print('    ' + str(order))
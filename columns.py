@@ -0,0 +1,335 @@
+from currencies import Price
+from markets import Market
+from pandas.api.extensions import (ExtensionArray, ExtensionDtype,
+                                   register_extension_dtype, take)
+from pandas.api.indexers import check_array_indexer
+import numpy as np
+import operator
+
+
+def option_tick_sizes(px):
+    # Vectorised OptionPrice tick size inference
+    return np.where(np.asarray(px, dtype=float) < 2, 0.05, 0.10)
+
+
+def round_to_tick(px, tick_size, how=np.round, prec=Price.prec):
+    # Vectorised Price.round/ceil/floor: round to bases other than 10
+    return np.round(tick_size * how(px / tick_size), prec)
+
+
+def infer_max_widths(px):
+    # Vectorised Market.infer_max_width
+    return np.select([px < 2, px < 5, px < 10], [0.25, 0.4, 0.8], 1.0)
+
+
+class Column(ExtensionArray):
+    # Columnar storage of value types as parallel float64 arrays
+    fields = ()
+
+    def __init__(self, **arrays):
+        for field in self.fields:
+            setattr(self, '_' + field, np.asarray(arrays[field], dtype=float))
+
+    def arrays(self):
+        return {field: getattr(self, '_' + field) for field in self.fields}
+
+    def _from_arrays(self, func):
+        # New column of the same type with func applied to every field
+        return type(self)(**{field: func(arr)
+                             for field, arr in self.arrays().items()})
+
+    def box(self, i):
+        # Build the scalar value type at position i
+        raise NotImplementedError
+
+    @classmethod
+    def unbox(cls, value):
+        # Split a scalar value type into its field values
+        raise NotImplementedError
+
+    @classmethod
+    def _from_sequence(cls, scalars, dtype=None, copy=False):
+        if isinstance(scalars, cls):
+            return scalars.copy() if copy else scalars
+        values = [cls.unbox(scalar) for scalar in scalars]
+        columns = zip(*values) if values else [[]] * len(cls.fields)
+        return cls(**dict(zip(cls.fields, columns)))
+
+    @classmethod
+    def _from_factorized(cls, values, original):
+        return cls._from_sequence(values)
+
+    @classmethod
+    def _concat_same_type(cls, to_concat):
+        return cls(**{field: np.concatenate([col.arrays()[field]
+                                             for col in to_concat])
+                      for field in cls.fields})
+
+    def __getitem__(self, item):
+        if np.ndim(item) == 0 and isinstance(item, (int, np.integer)):
+            return self.box(item)
+        if not isinstance(item, slice):
+            item = check_array_indexer(self, item)
+        return self._from_arrays(lambda arr: arr[item])
+
+    def __setitem__(self, key, value):
+        if isinstance(value, type(self)):
+            arrays = value.arrays()
+        elif np.ndim(value) > 0:
+            arrays = type(self)._from_sequence(value).arrays()
+        else:
+            arrays = dict(zip(self.fields, self.unbox(value)))
+        for field, arr in self.arrays().items():
+            arr[key] = arrays[field]
+
+    def __len__(self):
+        return len(getattr(self, '_' + self.fields[0]))
+
+    def __array__(self, dtype=None):
+        return np.array([self.box(i) for i in range(len(self))], dtype=object)
+
+    @property
+    def nbytes(self):
+        return sum(arr.nbytes for arr in self.arrays().values())
+
+    def isna(self):
+        return np.isnan(getattr(self, '_' + self.fields[0]))
+
+    def take(self, indices, allow_fill=False, fill_value=None):
+        if fill_value is None:
+            fill_value = np.nan
+        return self._from_arrays(lambda arr: take(arr, indices,
+                                                  allow_fill=allow_fill,
+                                                  fill_value=fill_value))
+
+    def copy(self):
+        return self._from_arrays(np.copy)
+
+    def _values_for_factorize(self):
+        return self.astype(object), np.nan
+
+    def _formatter(self, boxed=False):
+        return str
+
+    def _reduce(self, name, *, skipna=True, **kwargs):
+        # Series reductions, e.g. df.call.sum(); columns of value types
+        # with no meaningful reduction, such as Markets, raise as pandas
+        # expects
+        raise TypeError(f'{type(self).__name__} does not support {name}')
+
+
+@register_extension_dtype
+class PriceDtype(ExtensionDtype):
+    name = 'price'
+    type = Price
+    kind = 'O'
+    na_value = np.nan
+
+    @classmethod
+    def construct_array_type(cls):
+        return PriceColumn
+
+
+class PriceColumn(Column):
+    """
+    Column of Prices stored as float64 price and tick size arrays
+    """
+    fields = ('price', 'tick')
+
+    @classmethod
+    def from_floats(cls, prices, tick_size=None):
+        prices = np.asarray(prices, dtype=float)
+        if tick_size is None:
+            tick_size = Price.default_tick_size
+        return cls(price=prices,
+                   tick=np.broadcast_to(tick_size, prices.shape).copy())
+
+    @classmethod
+    def option_prices(cls, prices):
+        # Column of OptionPrices with inferred tick sizes
+        return cls.from_floats(prices, option_tick_sizes(prices))
+
+    @property
+    def dtype(self):
+        return PriceDtype()
+
+    def box(self, i):
+        return Price(self._price[i], self._tick[i])
+
+    @classmethod
+    def unbox(cls, value):
+        return float(value), getattr(value, 'tick_size',
+                                     Price.default_tick_size)
+
+    def __array__(self, dtype=None):
+        # Boxed Prices by default, raw prices when a numeric dtype is asked
+        if dtype is None or np.dtype(dtype) == object:
+            return Column.__array__(self)
+        return self._price.astype(dtype, copy=False)
+
+    def update(self, prices):
+        # Overwrite prices in place, keeping tick sizes
+        self._price[:] = prices
+
+    def round(self):
+        return round_to_tick(self._price, self._tick)
+
+    def ceil(self):
+        return round_to_tick(self._price, self._tick, np.ceil)
+
+    def floor(self):
+        return round_to_tick(self._price, self._tick, np.floor)
+
+    def _reduce(self, name, *, skipna=True, **kwargs):
+        # Prices for sum, mean, median, min and max, as from summing or
+        # comparing the boxed Prices; floats for std, var and prod
+        prices = self._price
+        if name in ('min', 'max'):
+            missing = np.isnan(prices)
+            if missing.all() or (missing.any() and not skipna):
+                return Price(np.nan)
+            i = int((np.nanargmin if name == 'min' else np.nanargmax)(prices))
+            return self.box(i)
+        if name not in ('sum', 'mean', 'median', 'std', 'var', 'prod'):
+            return Column._reduce(self, name)
+        if skipna:
+            prices = prices[~np.isnan(prices)]
+        if not len(prices) and name not in ('sum', 'prod'):
+            value = np.nan
+        elif name in ('std', 'var'):
+            value = getattr(np, name)(prices, ddof=kwargs.get('ddof', 1))
+        else:
+            value = getattr(np, name)(prices)
+        if name in ('sum', 'mean', 'median'):
+            return Price(value)
+        return float(value)
+
+    def _binop(self, other, op):
+        # Scalar/elementwise arithmetic keeping this column's tick sizes
+        if isinstance(other, PriceColumn):
+            other = other._price
+        elif hasattr(other, 'to_numpy'):
+            return NotImplemented
+        elif np.ndim(other) == 0:
+            other = float(other)
+        return PriceColumn(price=op(self._price, np.asarray(other, float)),
+                           tick=self._tick.copy())
+
+    def _cmpop(self, other, op):
+        if isinstance(other, PriceColumn):
+            other = other._price
+        elif hasattr(other, 'to_numpy'):
+            return NotImplemented
+        elif np.ndim(other) == 0:
+            other = float(other)
+        return op(self._price, other)
+
+    def __add__(self, other):
+        return self._binop(other, operator.add)
+
+    def __radd__(self, other):
+        return self._binop(other, lambda a, b: b + a)
+
+    def __sub__(self, other):
+        return self._binop(other, operator.sub)
+
+    def __rsub__(self, other):
+        return self._binop(other, lambda a, b: b - a)
+
+    def __mul__(self, other):
+        return self._binop(other, operator.mul)
+
+    def __rmul__(self, other):
+        return self._binop(other, lambda a, b: b * a)
+
+    def __truediv__(self, other):
+        return self._binop(other, operator.truediv)
+
+    def __neg__(self):
+        return self._binop(-1, operator.mul)
+
+    def __eq__(self, other):
+        return self._cmpop(other, operator.eq)
+
+    def __ne__(self, other):
+        return self._cmpop(other, operator.ne)
+
+    def __lt__(self, other):
+        return self._cmpop(other, operator.lt)
+
+    def __le__(self, other):
+        return self._cmpop(other, operator.le)
+
+    def __gt__(self, other):
+        return self._cmpop(other, operator.gt)
+
+    def __ge__(self, other):
+        return self._cmpop(other, operator.ge)
+
+
+@register_extension_dtype
+class MarketDtype(ExtensionDtype):
+    name = 'market'
+    type = Market
+    kind = 'O'
+    na_value = np.nan
+
+    @classmethod
+    def construct_array_type(cls):
+        return MarketColumn
+
+
+class MarketColumn(Column):
+    """
+    Column of Markets stored as float64 bid, ask and tick size arrays
+    """
+    fields = ('bid', 'ask', 'tick')
+
+    @classmethod
+    def from_price(cls, mids, width=None):
+        # Vectorised Market.from_price over a whole column of mid prices
+        mids = np.asarray(mids, dtype=float)
+        max_width = infer_max_widths(mids)
+        max_width = infer_max_widths(mids - 0.5 * max_width)
+        if width is None:
+            width = max_width
+        tick_size = option_tick_sizes(mids)
+        bid = round_to_tick(mids - 0.5 * width, tick_size, np.ceil)
+        ask = round_to_tick(mids + 0.5 * width, tick_size, np.floor)
+        return cls(bid=bid, ask=ask, tick=tick_size)
+
+    @property
+    def dtype(self):
+        return MarketDtype()
+
+    def box(self, i):
+        return Market(self._bid[i], self._ask[i])
+
+    @classmethod
+    def unbox(cls, value):
+        if np.ndim(value) == 0 and not isinstance(value, Market):
+            # Missing values from reindexing/alignment
+            return np.nan, np.nan, np.nan
+        return float(value.bid), float(value.ask), np.nan
+
+    def isna(self):
+        return np.isnan(self._bid) & np.isnan(self._ask)
+
+    def get_mid(self):
+        return PriceColumn.from_floats((self._bid + self._ask) / 2)
+
+    def contains(self, vals):
+        vals = np.asarray(vals, dtype=float)
+        return (self._bid <= vals) & (vals <= self._ask)
+
+    def nullify(self):
+        # Set every market to blanks/nulls
+        return self._from_arrays(lambda arr: np.full_like(arr, np.nan))
+
+    def __eq__(self, other):
+        if isinstance(other, MarketColumn):
+            return ((self._bid == other._bid) & (self._ask == other._ask))
+        elif isinstance(other, Market):
+            return ((self._bid == float(other.bid)) &
+                    (self._ask == float(other.ask)))
+        return NotImplemented
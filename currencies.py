@@ -1,37 +1,103 @@
 import math
-import numpy as np
+import operator
 from strings import spaces
 
 
-class Price(object):
+def readonly(name):
+    # Read-only public view of the private slot _<name>
+    return property(operator.attrgetter('_' + name))
+
+
+def _restore(cls, state):
+    # Unpickle an Immutable from its slot values
+    self = object.__new__(cls)
+    for name, value in state.items():
+        setattr(self, name, value)
+    return self
+
+
+class Immutable(object):
+    # Slotted value type with read-only fields and a cached hash
+    __slots__ = ('_hash',)
+
+    def _key(self):
+        # Tuple of values defining equality and hashing
+        raise NotImplementedError
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash(self._key())
+            return self._hash
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # Cached hashes may depend on object ids, so are not pickled
+        slots = [slot for cls in type(self).__mro__
+                 for slot in getattr(cls, '__slots__', ())
+                 if slot != '_hash']
+        return _restore, (type(self), {slot: getattr(self, slot)
+                                       for slot in slots})
+
+
+def _unwrap(other):
+    # Raw value of a Price, anything else unchanged
+    if isinstance(other, Price):
+        return other._price
+    return other
+
+
+def _as_float(other):
+    # Unwrap a Price or number without a redundant float() round-trip
+    if type(other) is float:
+        return other
+    elif isinstance(other, Price):
+        return other._price
+    return float(other)
+
+
+class Price(Immutable):
     # A single price, rounded to appropriate tick size
+    __slots__ = ('_price', '_tick_size')
     default_tick_size = 0.01
     prec = 2
+    price = readonly('price')
+    tick_size = readonly('tick_size')
 
-    def __init__(self, price=np.nan, tick_size=None):
-        price = float(price)
-        self.price = price
+    def __init__(self, price=math.nan, tick_size=None):
+        if type(price) is not float:
+            price = float(price)
+        self._price = price
         if tick_size is None:
             tick_size = self.default_tick_size
-        self.tick_size = tick_size
+        self._tick_size = tick_size
+
+    def _key(self):
+        return self._price
 
     def round(self):
         # Round to bases other than 10
         # prec = # d.p. of base
-        base = self.tick_size
-        return round(base * round(float(self.price)/base), self.prec)
+        base = self._tick_size
+        return round(base * round(self._price/base), self.prec)
 
     def ceil(self):
         # Round to bases other than 10
         # prec = # d.p. of base
-        base = self.tick_size
-        return round(base * math.ceil(float(self.price)/base), self.prec)
+        base = self._tick_size
+        return round(base * math.ceil(self._price/base), self.prec)
 
     def floor(self):
         # Round to bases other than 10
         # prec = # d.p. of base
-        base = self.tick_size
-        return round(base * math.floor(float(self.price)/base), self.prec)
+        base = self._tick_size
+        return round(base * math.floor(self._price/base), self.prec)
 
     def change(self, val):
         # Change to alternate value
@@ -39,84 +105,105 @@ class Price(object):
 
     def __repr__(self):
         # Basic string representation
-        return repr(self.price)
+        return repr(self._price)
 
     def __str__(self):
         # Prettified string representation taking up 5 horizontal spaces
-        price = self.price
-        if np.isnan(price):
+        price = self._price
+        if math.isnan(price):
             return spaces(5)
         else:
             return "{:>5.2f}".format(price)
 
     def __format__(self, align=">"):
         # Horizontally aligned string representation
-        price = self.price
-        if np.isnan(price):
+        price = self._price
+        if math.isnan(price):
             return spaces(5)
         else:
-            return "{:{align}5.2f}".format(self.price, align=align)
+            return "{:{align}5.2f}".format(self._price, align=align)
 
     def __add__(self, other):
         # Scalar addition
-        return Price(float(self) + float(other))
+        return _make(self._price + _as_float(other))
 
     def __radd__(self, other):
         # Scalar addition
-        return Price(float(self) + float(other))
+        return _make(self._price + _as_float(other))
 
     def __sub__(self, other):
         # Scalar subtraction
-        return Price(float(self) - float(other))
+        return _make(self._price - _as_float(other))
 
     def __rsub__(self, other):
         # Scalar difference
-        return Price(float(other) - float(self))
+        return _make(_as_float(other) - self._price)
 
     def __mul__(self, other):
         # Scalar multiplication
-        return Price(float(self) * float(other))
+        return _make(self._price * _as_float(other))
 
     def __rmul__(self, other):
         # Scalar multiplication
-        return Price(float(self) * float(other))
+        return _make(self._price * _as_float(other))
 
     def __truediv__(self, other):
         # Scalar division
-        return Price(float(self) / float(other))
+        return _make(self._price / _as_float(other))
 
     def __float__(self):
         # Python float representation
-        return self.price
+        return self._price
 
     def __int__(self):
         # Python int representation
-        return int(self.price)
+        return int(self._price)
+
+    def __eq__(self, other):
+        return self._price == _unwrap(other)
+
+    __hash__ = Immutable.__hash__
 
     def __gt__(self, other):
-        return self.price > other
+        return self._price > _unwrap(other)
 
     def __ge__(self, other):
-        return self.price >= other
+        return self._price >= _unwrap(other)
 
     def __lt__(self, other):
-        return self.price < other
+        return self._price < _unwrap(other)
+
+    def __le__(self, other):
+        return self._price <= _unwrap(other)
 
     def __bool__(self):
-        return not np.isnan(self.price)
+        return not math.isnan(self._price)
+
+
+def _make(price, tick_size=Price.default_tick_size, _new=object.__new__):
+    # Fast path for a Price from a Python float, skipping float() and __init__
+    self = _new(Price)
+    self._price = price
+    self._tick_size = tick_size
+    return self
 
 
 class OptionPrice(Price):
     """
     The price of an option with an inferred tick size
     """
+    __slots__ = ()
 
-    def __init__(self, px):
+    @classmethod
+    def infer_tick_size(cls, px):
+        # Tick size for an option trading at px
         if px < 2:
-            tick_size = 0.05
+            return 0.05
         else:
-            tick_size = 0.10
-        Price.__init__(self, px, tick_size)
+            return 0.10
+
+    def __init__(self, px):
+        Price.__init__(self, px, self.infer_tick_size(px))
 
 
 if __name__ == "__main__":
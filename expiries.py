@@ -1,6 +1,11 @@
 import datetime
 import calendar
-import pandas as pd
+import functools
+import numpy as np
+
+first_year = 1990
+last_year = 2100
+trading_days = 252
 
 
 def is_third_friday(date):
@@ -18,31 +23,100 @@ def month_fridays(year, month):
     return fridays
 
 
-def month_expiry(year, month):
-    return month_fridays(year, month)[2]
+def as_days(date):
+    # Dates, datetimes, strings or arrays thereof as datetime64[D]
+    if date is None:
+        date = datetime.date.today()
+    return np.asarray(date, dtype='datetime64[D]')
+
+
+def as_output(values):
+    # Python scalars for scalar queries, arrays for array queries
+    if np.ndim(values) == 0:
+        return values.item()
+    return values
+
+
+class ExpiryCalendar(object):
+    """
+    Precomputed third-Friday expiries and cumulative business-day counts
+    between first_year and last_year, so lookups are array indexing and
+    searchsorted rather than date arithmetic. Expiries falling on a
+    holiday move to the previous business day.
+    """
+
+    def __init__(self, holidays=()):
+        self.holidays = np.array(holidays, dtype='datetime64[D]')
+        months = np.arange(np.datetime64(f'{first_year}-01', 'M'),
+                           np.datetime64(f'{last_year + 2}-01', 'M'))
+        third_fridays = np.busday_offset(months.astype('datetime64[D]'), 2,
+                                         roll='forward', weekmask='Fri')
+        self.expiries = np.busday_offset(third_fridays, 0, roll='backward',
+                                         holidays=self.holidays)
+        self.start = months[0].astype('datetime64[D]')
+        days = np.arange(self.start, self.expiries[-1] + 1)
+        is_busday = np.is_busday(days, holidays=self.holidays)
+        # Number of business days in [start, start + i)
+        self.cum_busdays = np.concatenate([[0], np.cumsum(is_busday)])
+
+    def offsets(self, days):
+        # Row of each date in the business-day table
+        offsets = (days - self.start).astype(int)
+        if np.any(offsets < 0) or np.any(offsets >= len(self.cum_busdays)):
+            raise ValueError('Date outside expiry table: ', days)
+        return offsets
+
+    def month_expiry(self, year, month):
+        index = (np.asarray(year) - first_year) * 12 + np.asarray(month) - 1
+        return self.expiries[index]
+
+    def next_expiry(self, days):
+        # First expiry strictly after each date
+        index = np.searchsorted(self.expiries, days, side='right')
+        if np.any(index >= len(self.expiries)):
+            raise ValueError('Date outside expiry table: ', days)
+        return self.expiries[index]
+
+    def busdays_between(self, start, end):
+        # Business days in [start, end]
+        return (self.cum_busdays[self.offsets(end) + 1] -
+                self.cum_busdays[self.offsets(start)])
+
+    def days_to_expiry(self, days):
+        return self.busdays_between(days, self.next_expiry(days))
+
+
+@functools.lru_cache(maxsize=None)
+def expiry_calendar(holidays=()):
+    # Shared table for each holiday calendar, built on first use
+    return ExpiryCalendar(holidays)
+
+
+def month_expiry(year, month, holidays=()):
+    cal = expiry_calendar(tuple(holidays))
+    return as_output(cal.month_expiry(year, month))
 
 
-def this_expiry(date):
-    return month_expiry(date.year, date.month)
+def this_expiry(date, holidays=()):
+    return month_expiry(date.year, date.month, holidays)
 
 
-def next_expiry(date):
-    this_month = this_expiry(date)
-    if this_month > date:
-        return this_month
-    else:
-        next_month = date + pd.tseries.offsets.BMonthBegin()
-        return this_expiry(next_month)
+def next_expiry(date=None, holidays=()):
+    days = as_days(date)
+    return as_output(expiry_calendar(tuple(holidays)).next_expiry(days))
 
 
-def days_to_expiry(date=datetime.date.today()):
-    expiry = next_expiry(date)
-    return pd.date_range(date, expiry, freq=pd.tseries.offsets.BDay()).size
+def days_to_expiry(date=None, holidays=()):
+    """
+    Business days from date to the next expiry, both inclusive.
+    date defaults to today when called, and may be an array of dates
+    """
+    days = as_days(date)
+    return as_output(expiry_calendar(tuple(holidays)).days_to_expiry(days))
 
 
-def years_to_expiry(date=datetime.date.today()):
-    trading_days = 252
-    return days_to_expiry(date) / trading_days
+def years_to_expiry(date=None, holidays=()):
+    return days_to_expiry(date, holidays) / trading_days
 
 
 if __name__ == '__main__':
@@ -1,58 +1,151 @@
+from concurrent.futures import Future
 import sys
-import random
+import threading
+import numpy as np
 from boards import PublicBoard
-from user_input import get_user_market, get_user_command
-from sounds import shout, rand_countdown
-from order_types import IcebergOrder
-from matching import is_book_crossed
-from game_logging import Logger
+from user_input import get_user_market, get_user_command, market_query
+from user_input import immediate_trade
+from user_input import phrases as user_phrases
+from sounds import shout, rand_countdown, prewarm
+from order_types import IcebergOrder, Direction
+from structures import StructurePricer, vol_quoted
+from rendering import BoardRenderer
+from matching import fill_str, is_book_crossed
+from game_logging import Recorder
+from ledger import Ledger
 
 
 class Mock(object):
     # Game of mock against a bot
 
-    def __init__(self):
-        self.logger = Logger()
+    def __init__(self, seed=None):
+        self.logger = Recorder()
+        # Client responses land on the audio thread while the game thread
+        # waits for input, so both hold the lock to touch game state
+        self.lock = threading.RLock()
+        self.pending = []
         num_clients = 5
+        if seed is None:
+            # Draw a seed so the session's randomness is recorded
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+        self.rng = np.random.default_rng(seed)
         self.publicBoard = PublicBoard()
         self.fairBoard = self.publicBoard.fair
-        self.clients = [IcebergOrder.rand(self.fairBoard)
-                        for _ in range(num_clients)]
+        self.logger.start(seed, self.fairBoard)
+        self.renderer = BoardRenderer(self.publicBoard)
+        self.ledger = Ledger()
+        self.clients = IcebergOrder.rand_many(self.fairBoard, num_clients,
+                                              self.rng)
         for client in self.clients:
             self.logger.add(client)
         self.logger.add(self.fairBoard)
+        self.prewarm()
         self.play()
 
+    def prewarm(self):
+        # Synthesize expected phrases in the background before play starts
+        phrases = ['Game over', 'Nothing there...'] + user_phrases
+        for client in self.clients:
+            phrases += client.phrases()
+            phrases.append(market_query(client.peek()))
+        prewarm(phrases)
+
     def play(self):
-        if not self.clients:
-            return shout('Game over')
-        print(self.publicBoard)
-        self.get_user_command()
-        order = self.pop()
+        # Iterative game loop; a user command redraws the whole board
+        while self.clients:
+            with self.lock:
+                self.renderer.draw()
+            if self.get_user_command():
+                self.renderer.invalidate()
+                continue
+            self.turn(self.pop())
+            if self.get_user_command():
+                self.renderer.invalidate()
+        # Let clients still counting down answer before the game ends
+        for answered in self.pending:
+            answered.result()
+        return shout('Game over', block=True)
+
+    def turn(self, order):
+        with self.lock:
+            self.logger.quote(order)
+            self.logger.flush()
         mkt = get_user_market(order)
-        if mkt:
-            self.logger.show('Player market: {}'.format(mkt))
-            rand_countdown()
-            if is_book_crossed(order, mkt):
-                self.logger.shout(order.take_str())
+        with self.lock:
+            if mkt:
+                self.logger.market(order.option, mkt)
+                self.logger.show('Player market: {}'.format(mkt))
+                self.mark(order.option, mkt)
+                dirn = immediate_trade(mkt, order.option.get_price())
+                if dirn is not None:
+                    # Through fair: the client has already taken the market
+                    self.fill(order, dirn, mkt)
+                    return
+                # The client answers when the countdown ends; play carries
+                # on taking input in the meantime
+                answered = Future()
+                rand_countdown(rng=self.rng).add_done_callback(
+                    lambda _: self.respond(order, mkt, answered))
+                self.pending.append(answered)
             else:
-                self.logger.shout('Nothing there...')
-        else:
-            self.publicBoard.append(order)
-            self.logger.shout(str(order))
-        self.get_user_command()
-        self.play()
+                self.logger.rest(order)
+                self.logger.shout(str(order))
+                # Clients' orders trade with each other when they cross
+                for fill in self.publicBoard.append(order):
+                    self.logger.shout(fill_str(fill))
+
+    def respond(self, order, mkt, answered):
+        # Completion of a client's countdown: trade on the player's market
+        # if the client crosses it
+        with self.lock:
+            try:
+                if is_book_crossed(order, mkt):
+                    self.logger.shout(order.take_str())
+                    self.fill(order, -order.direction, mkt)
+                else:
+                    self.logger.shout('Nothing there...')
+            finally:
+                answered.set_result(None)
+
+    def fill(self, order, dirn, mkt):
+        # Record the player's side of a trade on their market
+        dirn = Direction(dirn)
+        price = mkt.bid if dirn is Direction.BUY else mkt.ask
+        self.ledger.record(order.option, dirn, price, order.size)
+        self.logger.fill(order.option, dirn, price, order.size)
+        mark = self.ledger.mark(self.fairBoard, self.publicBoard)
+        self.logger.add(f'Player {dirn} {order.size} {order.option} @ '
+                        f'{price}; P&L {mark.pnl:.2f}, '
+                        f'delta {mark.delta:.1f}, vega {mark.vega:.1f}')
+
+    def mark(self, option, mkt):
+        # Log the vols implied by the player's bid and offer, and by fair
+        # on the smile, for structures whose price implies a vol
+        if option.structure not in vol_quoted:
+            return None
+        pricer = StructurePricer([option] * 3, self.fairBoard)
+        vols = pricer.implied_vols([float(mkt.bid), float(mkt.ask),
+                                    float(option.get_price())])
+        bid_vol, ask_vol, fair_vol = ('-' if np.isnan(vol) else f'{vol:.1%}'
+                                      for vol in vols)
+        self.logger.add(f'Player market vols: {bid_vol}-{ask_vol} '
+                        f'vs fair {fair_vol}')
+        return vols
 
     def get_user_command(self):
+        # The log is only flushed on a timer as it is written, so flush it
+        # before the game sits waiting for the player
+        with self.lock:
+            self.logger.flush()
         cmd = get_user_command()
         if cmd:
             method_to_call = getattr(self, cmd)
             method_to_call()
-            self.play()
+        return cmd
 
     def pop(self):
         clients = self.clients
-        client = random.choice(clients)
+        client = clients[self.rng.integers(len(clients))]
         popped = client.pop()
         if client.is_empty():
             clients.remove(client)
@@ -64,6 +157,15 @@ class Mock(object):
     def show_log(self):
         self.logger.view()
 
+    def show_position(self):
+        # Read the position under the lock but wait for Enter outside it
+        with self.lock:
+            mark = self.ledger.mark(self.fairBoard, self.publicBoard)
+            position = str(self.ledger)
+        self.logger.confirm(f'{position}\n'
+                            f'P&L {mark.pnl:.2f} (mids {mark.mid_pnl:.2f}), '
+                            f'delta {mark.delta:.1f}, vega {mark.vega:.1f}')
+
     def exit(self):
         sys.exit()
 
@@ -1,37 +1,293 @@
+import atexit
+import bisect
+import collections
+import json
+import math
 import os
+import struct
+import time
 from sounds import shout
 
 
 class Logger:
+    """
+    Session log written as newline-delimited JSON records through one
+    buffered file handle, flushed every flush_interval seconds and before
+    the game waits for input. Only the last ring_size messages are kept in
+    memory for show_log.
+    """
     dir_name = 'temp'
-    file_name = 'log.txt'
+    file_name = 'log.jsonl'
+    ring_size = 500
+    flush_interval = 1.0
 
     def __init__(self):
-        self.log_list = []
+        self.log_list = collections.deque(maxlen=self.ring_size)
         dir_name = self.dir_name
         if not os.path.exists(dir_name):
             os.mkdir(dir_name)
         self.fpath = os.path.join(dir_name, self.file_name)
-        with open(self.fpath, 'w') as f:
-            f.write('')
+        self.file = open(self.fpath, 'w', buffering=1 << 16)
+        self.last_flush = time.monotonic()
+        self.seq = 0
+        atexit.register(self.close)
 
-    def add(self, msg):
+    def add(self, msg, kind='note'):
         msg = str(msg)
         self.log_list.append(msg)
-        with open(self.fpath, 'a') as f:
-            f.write(msg + '\n')
+        record = {'seq': self.seq, 'time': time.time(), 'kind': kind,
+                  'msg': msg}
+        self.file.write(json.dumps(record) + '\n')
+        self.seq += 1
+        self.flush_due()
+
+    def flush_due(self):
+        # Flush through self.flush, so subclasses flush their own files too
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.file.closed:
+            self.file.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
 
     def show(self, msg):
         print(msg)
-        self.add(msg)
+        self.add(msg, 'show')
 
     def shout(self, msg):
         shout(msg)
-        self.add(msg)
+        self.add(msg, 'shout')
 
     def confirm(self, msg):
         print(msg)
+        self.flush()
         input('Press Enter to proceed:')
 
     def view(self):
         self.confirm('\n'.join(self.log_list))
+
+
+def read_log(fpath):
+    """
+    Stream records from a session log one line at a time
+    """
+    with open(fpath, 'r') as f:
+        for line in f:
+            if line.endswith('\n'):
+                yield json.loads(line)
+
+
+def tail_log(fpath, n=10, block_size=1 << 12):
+    """
+    Last n records of a session log, reading backwards from the end in
+    blocks rather than loading the whole file
+    """
+    with open(fpath, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        data = b''
+        while pos > 0 and data.count(b'\n') <= n:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.split(b'\n')[:-1]
+    if pos > 0:
+        lines = lines[1:]
+    return [json.loads(line) for line in lines[-n:]]
+
+
+def follow_log(fpath, poll=0.25):
+    """
+    Yield records as they are appended to a live session log
+    """
+    with open(fpath, 'r') as f:
+        partial = ''
+        while True:
+            line = f.readline()
+            if not line:
+                time.sleep(poll)
+                continue
+            partial += line
+            if partial.endswith('\n'):
+                yield json.loads(partial)
+                partial = ''
+
+
+# Session events: kind byte, wall time and payload length, then a payload
+# packed by the kind's format
+event_header = struct.Struct('<cdH')
+# Option as structure number and up to three strikes, NaN padded
+option_format = 'B3d'
+event_formats = {
+    b'G': struct.Struct('<Q10d'),  # start: seed and board parameters
+    b'S': struct.Struct('<d'),  # spot move
+    b'Q': struct.Struct('<' + option_format + 'bdI'),  # client order
+    b'M': struct.Struct('<' + option_format + 'dd'),  # player market
+    b'F': struct.Struct('<' + option_format + 'bdI'),  # player fill
+    b'R': struct.Struct('<' + option_format + 'bdI'),  # order rested
+}
+# Board parameters recorded in the start event, after the seed
+board_fields = ('stock', 'rate', 'vol', 'skew', 'curvature', 'term',
+                'expiry', 'box', 'strikes', 'tick')
+# Sparse index entries of (event number, byte offset)
+index_entry = struct.Struct('<QQ')
+
+Event = collections.namedtuple('Event', ['seq', 'time', 'kind', 'fields'])
+
+
+def pack_option(option):
+    from structures import Structure
+    strikes = list(option.strikes) + [math.nan] * (3 - len(option.strikes))
+    return (list(Structure).index(option.structure), *strikes)
+
+
+def unpack_option(fields):
+    # (Structure, strikes) from the first four fields of an event
+    from structures import Structure
+    strikes = tuple(int(K) if K.is_integer() else K
+                    for K in fields[1:4] if K == K)
+    return list(Structure)[fields[0]], strikes
+
+
+class Recorder(Logger):
+    """
+    Logger that also records the session as an append-only stream of
+    struct-packed binary events: the board it started from, spot moves,
+    client orders, player markets and fills, orders rested in the book,
+    and every log message as a note. Events are a few dozen bytes each
+    and go through the same buffered, periodically flushed writes as the
+    log. Every index_every events a (number, offset) entry is added to a
+    sparse index file, so a replay can seek to any event without reading
+    the stream from the start. Index entries are held back until the
+    events they point at are flushed, so a session interrupted at any
+    point, e.g. at a prompt, replays from both files.
+    """
+    events_name = 'session.bin'
+    index_name = 'session.idx'
+    index_every = 256
+
+    def __init__(self):
+        Logger.__init__(self)
+        self.events_path = os.path.join(self.dir_name, self.events_name)
+        self.index_path = os.path.join(self.dir_name, self.index_name)
+        self.events = open(self.events_path, 'wb', buffering=1 << 16)
+        self.index = open(self.index_path, 'wb')
+        self.pending_index = []
+        self.num_events = 0
+        self.offset = 0
+
+    def record(self, kind, payload):
+        if self.num_events % self.index_every == 0:
+            self.pending_index.append(index_entry.pack(self.num_events,
+                                                       self.offset))
+        data = event_header.pack(kind, time.time(), len(payload)) + payload
+        self.events.write(data)
+        self.offset += len(data)
+        self.num_events += 1
+        self.flush_due()
+
+    def pack(self, kind, *fields):
+        self.record(kind, event_formats[kind].pack(*fields))
+
+    def start(self, seed, board):
+        # The seed and everything needed to rebuild the fair board
+        configs = board_settings(board)
+        self.pack(b'G', seed, *(configs[name] for name in board_fields))
+
+    def spot(self, S):
+        self.pack(b'S', float(S))
+
+    def quote(self, order):
+        self.pack(b'Q', *pack_option(order.option), int(order.direction),
+                  float(order.price), order.size)
+
+    def market(self, option, mkt):
+        self.pack(b'M', *pack_option(option), float(mkt.bid),
+                  float(mkt.ask))
+
+    def fill(self, option, direction, price, size):
+        self.pack(b'F', *pack_option(option), int(direction), float(price),
+                  size)
+
+    def rest(self, order):
+        self.pack(b'R', *pack_option(order.option), int(order.direction),
+                  float(order.price), order.size)
+
+    def add(self, msg, kind='note'):
+        self.record(b'N', str(msg).encode('utf-8')[:0xffff])
+        Logger.add(self, msg, kind)
+
+    def flush(self):
+        # Events first, then the index entries that point into them
+        if not self.events.closed:
+            self.events.flush()
+        if not self.index.closed:
+            self.index.write(b''.join(self.pending_index))
+            self.index.flush()
+            self.pending_index.clear()
+        Logger.flush(self)
+
+    def close(self):
+        self.flush()
+        for f in (self.events, self.index):
+            if not f.closed:
+                f.close()
+        Logger.close(self)
+
+
+def board_settings(board):
+    # Start event parameters of a PriceBoard
+    import settings
+    return {'stock': float(board.S), 'rate': board.rate, 'vol': board.sigma,
+            'skew': board.smile.skew, 'curvature': board.smile.curvature,
+            'term': board.smile.term, 'expiry': board.expiry,
+            'box': board.box, 'strikes': board.num_strikes,
+            'tick': settings.board.tick}
+
+
+def read_index(fpath):
+    # Sparse index of a session's events as (event numbers, byte offsets)
+    with open(fpath, 'rb') as f:
+        data = f.read()
+    data = data[:len(data) - len(data) % index_entry.size]
+    entries = list(index_entry.iter_unpack(data))
+    return [seq for seq, _ in entries], [offset for _, offset in entries]
+
+
+def read_events(fpath, start=0, index_path=None):
+    """
+    Stream a recorded session's events from event number start, seeking
+    via the sparse index to the nearest indexed event at or before it
+    """
+    seq = offset = 0
+    if start:
+        if index_path is None:
+            index_path = os.path.splitext(fpath)[0] + '.idx'
+        seqs, offsets = read_index(index_path)
+        i = bisect.bisect_right(seqs, start) - 1
+        if i >= 0:
+            seq, offset = seqs[i], offsets[i]
+    with open(fpath, 'rb') as f:
+        f.seek(offset)
+        header_size = event_header.size
+        while True:
+            header = f.read(header_size)
+            if len(header) < header_size:
+                return
+            kind, when, size = event_header.unpack(header)
+            payload = f.read(size)
+            if len(payload) < size:
+                return
+            if seq >= start:
+                if kind == b'N':
+                    fields = (payload.decode('utf-8', 'replace'),)
+                else:
+                    fields = event_formats[kind].unpack(payload)
+                yield Event(seq, when, kind, fields)
+            seq += 1
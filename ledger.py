@@ -0,0 +1,153 @@
+from collections import namedtuple
+from order_types import Direction
+from structures import StructurePricer, absolute, legs
+import numpy as np
+
+Mark = namedtuple('Mark', ['value', 'pnl', 'mid_pnl', 'delta', 'gamma',
+                           'vega', 'theta'])
+
+
+class Ledger(object):
+    """
+    Net position from the player's fills, held as call and put quantities
+    per strike plus stock and cash rather than as a list of fills. Each
+    structure fill is decomposed into its legs on arrival, so recording
+    is O(legs) and marking is one vectorised pass over the strikes held,
+    however long the session.
+    """
+    initial_capacity = 16
+
+    def __init__(self):
+        self.index = {}
+        self.strikes = np.zeros(self.initial_capacity)
+        self.calls = np.zeros(self.initial_capacity)
+        self.puts = np.zeros(self.initial_capacity)
+        self.stock = 0.0
+        self.cash = 0.0
+        self.fills = 0
+        self.lots = 0
+
+    def row(self, strike):
+        # Row for a strike, growing the arrays by doubling when full
+        row = self.index.get(strike)
+        if row is None:
+            row = len(self.index)
+            if row == len(self.strikes):
+                for name in ('strikes', 'calls', 'puts'):
+                    arr = getattr(self, name)
+                    setattr(self, name,
+                            np.concatenate([arr, np.zeros_like(arr)]))
+            self.strikes[row] = strike
+            self.index[strike] = row
+        return row
+
+    def record(self, option, direction, price, size):
+        """
+        Add a fill of size lots of an option structure at price, with
+        direction the player's side
+        """
+        qty = int(direction) * size
+        sign = 1.0
+        if option.structure in absolute:
+            # Quoted as an absolute value: the legs are reversed when
+            # they are worth less than zero
+            pricer = StructurePricer([option], option.board)
+            legs_value = pricer.weights() @ option.board.leg_values()
+            sign = pricer.signs(legs_value)[0]
+        for pos, leg, weight in legs[option.structure]:
+            row = self.row(option.strikes[pos])
+            if leg == 'call':
+                self.calls[row] += sign * weight * qty
+            else:
+                self.puts[row] += sign * weight * qty
+        self.cash -= qty * float(price)
+        self.fills += 1
+        self.lots += size
+        return self
+
+    def record_stock(self, direction, price, size):
+        # Add a stock fill, e.g. a delta hedge
+        qty = int(direction) * size
+        self.stock += qty
+        self.cash -= qty * float(price)
+        self.fills += 1
+        return self
+
+    def mark(self, board, market_board=None):
+        """
+        Mark the book to a PriceBoard's fair values and Greeks, and to a
+        MarketBoard's mids where it shows two-sided markets, falling back
+        to fair elsewhere. Delta and gamma include the smile moving with
+        spot, as on the board
+        """
+        n = len(self.index)
+        K = self.strikes[:n]
+        calls = self.calls[:n]
+        puts = self.puts[:n]
+        S = float(board.S)
+        if n == 0:
+            # No options held, so nothing to price
+            value = self.stock * S
+            return Mark(value, value + self.cash, value + self.cash,
+                        self.stock, 0.0, 0.0, 0.0)
+        # Same pricing as the board, so delta and gamma are smile-adjusted
+        grid = board.infer_grid(S, K)
+        value = calls @ grid.call + puts @ grid.put + self.stock * S
+        mid_value = value
+        if market_board is not None:
+            call_mids, put_mids = self.mids(market_board, K, grid)
+            mid_value = (calls @ call_mids + puts @ put_mids +
+                         self.stock * self.stock_mid(market_board, S))
+        return Mark(value=value,
+                    pnl=value + self.cash,
+                    mid_pnl=mid_value + self.cash,
+                    delta=(calls @ grid.calldelta +
+                           puts @ (grid.calldelta - 1) + self.stock),
+                    gamma=(calls + puts) @ grid.gamma,
+                    vega=(calls + puts) @ grid.vega,
+                    theta=calls @ grid.calltheta + puts @ grid.puttheta)
+
+    def mids(self, market_board, K, grid):
+        # Call and put mids at strikes K, or fair where there is no market
+        df = market_board.df
+        board_strikes = np.asarray(df.index, dtype=float)
+        rows = np.searchsorted(board_strikes, K).clip(0, len(df) - 1)
+        listed = board_strikes[rows] == K
+        mids = []
+        for col, fair in (('call', grid.call), ('put', grid.put)):
+            arrays = df[col].array.arrays()
+            mid = 0.5 * (arrays['bid'][rows] + arrays['ask'][rows])
+            mids.append(np.where(listed & ~np.isnan(mid), mid, fair))
+        return mids
+
+    def stock_mid(self, market_board, fair):
+        mid = float(market_board.S.get_mid())
+        return fair if np.isnan(mid) else mid
+
+    def legs(self):
+        # Non-zero call and put holdings by strike
+        n = len(self.index)
+        return {float(K): (float(c), float(p))
+                for K, c, p in zip(self.strikes[:n], self.calls[:n],
+                                   self.puts[:n])
+                if c or p}
+
+    def __str__(self):
+        lines = [f'{K:g}: {c:+g} calls, {p:+g} puts'
+                 for K, (c, p) in sorted(self.legs().items())]
+        lines.append(f'stock: {self.stock:+g}, cash: {self.cash:+.2f}')
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    from boards import MarketBoard, PriceBoard
+    from structures import Option, Structure
+    board = PriceBoard()
+    strikes = board.get_strikes()
+    ledger = Ledger()
+    straddle = Option(strikes[2], Structure.STRADDLE, board)
+    ledger.record(straddle, Direction.BUY, straddle.get_price() - 0.1, 100)
+    spread = Option(strikes[1:3], Structure.CALLSPREAD, board)
+    ledger.record(spread, Direction.SELL, spread.get_price() + 0.05, 50)
+    print(ledger)
+    print(ledger.mark(board, MarketBoard(board=board)))
@@ -1,9 +1,12 @@
-from currencies import Price, OptionPrice
-import numpy as np
+from currencies import Immutable, Price, OptionPrice, _make, readonly
+import math
 
 
-class Market(object):
+class Market(Immutable):
     # A 2-tuple of (bid price, ask price) for an option
+    __slots__ = ('_bid', '_ask')
+    bid = readonly('bid')
+    ask = readonly('ask')
 
     @classmethod
     def infer_max_width(cls, px):
@@ -26,7 +29,7 @@ class Market(object):
             width = max_width
         bid = mid - 0.5 * width
         ask = mid + 0.5 * width
-        tick_size = OptionPrice(mid).tick_size
+        tick_size = OptionPrice.infer_tick_size(mid)
         bid = Price(bid, tick_size).ceil()
         ask = Price(ask, tick_size).floor()
         return cls(bid, ask)
@@ -39,13 +42,15 @@ class Market(object):
             raise IOError('Bid cannot exceed ask price!', bid, ask)
         if ask - bid >= max_width + 0.01:
             raise IOError('Maximum width exceeded', bid, ask)
-        self.bid = Price(bid)
-        self.ask = Price(ask)
+        self._bid = _make(bid)
+        self._ask = _make(ask)
+
+    def _key(self):
+        return self._bid._price, self._ask._price
 
     def get_mid(self):
         # get mid market
-        mid = (self.bid + self.ask) / 2
-        return Price(mid)
+        return (self.bid + self.ask) / 2
 
     def contains(self, val):
         # Test that value lies inside market
@@ -60,15 +65,15 @@ class Market(object):
 
     def nullify(self):
         # Set to blanks/nulls
-        return self.change(np.nan, np.nan)
+        return self.change(math.nan, math.nan)
 
     def hasNull(self):
         # Test for blank/null in Market limits
-        return np.isnan(self.ask.price) or np.isnan(self.bid.price)
+        return math.isnan(self.ask.price) or math.isnan(self.bid.price)
 
     def __repr__(self):
         # Basic string representation
-        return repr(tuple(self.bid, self.ask))
+        return repr((self.bid, self.ask))
 
     def __str__(self):
         # Prettified string representation
@@ -81,6 +86,13 @@ class Market(object):
         elif isinstance(other, Market):
             return Market(self.bid + other.bid, self.ask + other.ask)
 
+    def __eq__(self, other):
+        if isinstance(other, Market):
+            return self._key() == other._key()
+        return NotImplemented
+
+    __hash__ = Immutable.__hash__
+
     def __getitem__(self, key):
         # List indexing
         if key == 0:
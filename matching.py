@@ -1,7 +1,203 @@
-from order_types import Direction
+from collections import deque, namedtuple
+from currencies import Price
+from order_types import Direction, Order
+import heapq
+import itertools
+import math
+
+Fill = namedtuple('Fill', ['option', 'price', 'size', 'maker_id', 'taker_id',
+                           'taker_direction'])
+
+
+def fill_str(fill):
+    # Announcement of a trade between two orders in a book
+    return f'{fill.size} lots of the {fill.option} trade at {fill.price:.2f}'
 
 
 def is_book_crossed(order, mkt):
     assert order.size > 0
     return (((order.direction == Direction.BUY) and (order.price > mkt.ask)) or
             ((order.direction == Direction.SELL) and (order.price < mkt.bid)))
+
+
+class Resting(object):
+    # Book entry for an order: a visible clip plus any hidden iceberg size
+    __slots__ = ('id', 'direction', 'price', 'visible', 'hidden', 'peak',
+                 'live')
+
+    def __init__(self, id, direction, price, visible, hidden, peak):
+        self.id = id
+        self.direction = direction
+        self.price = price
+        self.visible = visible
+        self.hidden = hidden
+        self.peak = peak
+        self.live = True
+
+    def size(self):
+        return self.visible + self.hidden
+
+
+class OrderBook(object):
+    """
+    Price-time priority limit order book for one option or structure.
+    Each side keeps a FIFO queue per price level and a heap of level
+    prices for O(log n) best bid/offer; cancelled orders and emptied
+    levels are dropped lazily. Iceberg orders show one clip at a time
+    and rejoin the back of their level when a clip is filled.
+    """
+    prec = 2
+
+    def __init__(self, option=None):
+        self.option = option
+        self.levels = {Direction.BUY: {}, Direction.SELL: {}}
+        self.heaps = {Direction.BUY: [], Direction.SELL: []}
+        self.orders = {}
+        self.counts = {}
+        self.ids = itertools.count(1)
+
+    def best(self, dirn):
+        # Best price on one side, or None if that side is empty
+        levels = self.levels[dirn]
+        heap = self.heaps[dirn]
+        while heap:
+            price = -int(dirn) * heap[0]
+            if price in levels:
+                return price
+            heapq.heappop(heap)
+        return None
+
+    def best_bid(self):
+        return self.best(Direction.BUY)
+
+    def best_offer(self):
+        return self.best(Direction.SELL)
+
+    def depth(self, dirn, price):
+        # Visible size resting at a price level
+        level = self.levels[dirn].get(price, ())
+        return sum(entry.visible for entry in level if entry.live)
+
+    def add(self, dirn, price, size, peak=None):
+        """
+        Match an incoming limit order, resting whatever is left.
+        Passing peak makes it an iceberg showing peak lots at a time.
+        Returns (order id, list of Fills)
+        """
+        if isinstance(price, Price):
+            price = price.round()
+        price = round(float(price), self.prec)
+        order_id = next(self.ids)
+        fills = self.match(dirn, price, size, order_id)
+        filled = sum(fill.size for fill in fills)
+        remaining = size - filled
+        if remaining > 0:
+            if peak is None or peak >= remaining:
+                peak = remaining
+            entry = Resting(order_id, dirn, price, peak, remaining - peak,
+                            peak)
+            self.orders[order_id] = entry
+            self.enqueue(entry)
+            key = (dirn, price)
+            self.counts[key] = self.counts.get(key, 0) + 1
+        return order_id, fills
+
+    def add_order(self, order):
+        return self.add(order.direction, order.price, order.size)
+
+    def enqueue(self, entry):
+        levels = self.levels[entry.direction]
+        if entry.price not in levels:
+            levels[entry.price] = deque()
+            heapq.heappush(self.heaps[entry.direction],
+                           -int(entry.direction) * entry.price)
+        levels[entry.price].append(entry)
+
+    def cancel(self, order_id):
+        # Remove a resting order, returning its unfilled size
+        entry = self.orders.pop(order_id, None)
+        if entry is None:
+            return 0
+        entry.live = False
+        self.remove_from_level(entry)
+        return entry.size()
+
+    def remove_from_level(self, entry):
+        # Drop the level once its last live order has gone
+        key = (entry.direction, entry.price)
+        self.counts[key] -= 1
+        if self.counts[key] == 0:
+            del self.counts[key]
+            del self.levels[entry.direction][entry.price]
+
+    def modify(self, order_id, price=None, size=None):
+        """
+        Change a resting order. Reducing size keeps time priority;
+        a new price or a larger size re-enters at the back of the queue
+        """
+        entry = self.orders.get(order_id)
+        if entry is None:
+            raise KeyError('Unknown order id: ', order_id)
+        if size is None:
+            size = entry.size()
+        if (price is None or round(float(price), self.prec) == entry.price) \
+                and size <= entry.size():
+            cut = entry.size() - size
+            hidden_cut = min(cut, entry.hidden)
+            entry.hidden -= hidden_cut
+            entry.visible -= cut - hidden_cut
+            if entry.visible <= 0:
+                self.cancel(order_id)
+            return order_id, []
+        if price is None:
+            price = entry.price
+        peak = entry.peak if entry.hidden else None
+        self.cancel(order_id)
+        return self.add(entry.direction, price, size, peak)
+
+    def match(self, dirn, price, size, taker_id):
+        # Fill against the opposite side while prices cross
+        other = Direction(-int(dirn))
+        levels = self.levels[other]
+        fills = []
+        while size > 0:
+            best = self.best(other)
+            if best is None or int(dirn) * (price - best) < 0:
+                break
+            level = levels[best]
+            while level and size > 0:
+                maker = level[0]
+                if not maker.live:
+                    level.popleft()
+                    continue
+                qty = min(size, maker.visible)
+                fills.append(Fill(self.option, best, qty, maker.id, taker_id,
+                                  dirn))
+                size -= qty
+                maker.visible -= qty
+                if maker.visible == 0:
+                    level.popleft()
+                    if maker.hidden > 0:
+                        # Replenish the iceberg clip with new time priority
+                        maker.visible = min(maker.peak, maker.hidden)
+                        maker.hidden -= maker.visible
+                        level.append(maker)
+                    else:
+                        maker.live = False
+                        del self.orders[maker.id]
+                        self.remove_from_level(maker)
+        return fills
+
+    def market(self, dirn, size):
+        # Fill size lots at any price, without resting the remainder
+        return self.match(dirn, math.inf * int(dirn), size, next(self.ids))
+
+    def top_orders(self):
+        # Aggregate visible size at the best bid and offer as Orders
+        orders = []
+        for dirn in Direction:
+            best = self.best(dirn)
+            if best is not None:
+                orders.append(Order(self.option, dirn, best,
+                                    self.depth(dirn, best)))
+        return orders
@@ -1,7 +1,6 @@
 import enum
-import random
-from structures import Option
-from currencies import OptionPrice
+from structures import Option, Structure, strike_sets
+from currencies import Immutable, OptionPrice, readonly
 
 
 @enum.unique
@@ -21,15 +20,30 @@ class Direction(enum.IntEnum):
         return self.value
 
 
-class Order(object):
+class Order(Immutable):
+    __slots__ = ('_option', '_direction', '_price', '_size')
+    option = readonly('option')
+    direction = readonly('direction')
+    price = readonly('price')
+    size = readonly('size')
 
     def __init__(self, opt, dirn, price, size):
-        self.option = opt
-        self.direction = dirn
+        self._option = opt
+        self._direction = dirn
         if isinstance(price, float):
             price = OptionPrice(price).round()
-        self.price = price
-        self.size = size
+        self._price = price
+        self._size = size
+
+    def _key(self):
+        return self._option, self._direction, self._price, self._size
+
+    def __eq__(self, other):
+        if isinstance(other, Order):
+            return self._key() == other._key()
+        return NotImplemented
+
+    __hash__ = Immutable.__hash__
 
     def __str__(self):
         opt = self.option
@@ -66,16 +80,59 @@ class Order(object):
 
 
 class IcebergOrder(object):
+    # Choices for randomly generated clients
+    directions = (Direction.BUY, Direction.SELL)
+    aggressions = (0.05, 0.1, 0.2)
+    peaks = (50, 100, 200, 500)
+    totals = (200, 500, 1000, 2000)
 
     @classmethod
-    def rand(cls, board):
-        option = Option.rand(board)
-        dirn = random.choice([Direction.BUY, Direction.SELL])
-        agg = random.choice([0.05, 0.1, 0.2])
-        peak = random.choice([50, 100, 200, 500])
-        total = random.choice([200, 500, 1000, 2000])
+    def rand(cls, board, rng=None):
+        # rng may be a numpy Generator, a seed, or None for fresh entropy
+        import numpy as np
+        rng = np.random.default_rng(rng)
+        option = Option.rand(board, rng)
+        dirn, agg, peak, total = (
+            choices[rng.integers(len(choices))]
+            for choices in (cls.directions, cls.aggressions, cls.peaks,
+                            cls.totals))
         return cls(option, dirn, agg, peak, total)
 
+    @classmethod
+    def rand_many(cls, board, n, rng=None):
+        """
+        n random clients, drawing every structure, strike set, direction,
+        aggression and size as arrays in one pass over rng
+        """
+        import numpy as np
+        rng = np.random.default_rng(rng)
+        structs = list(Structure)
+        strikes = board.get_strikes()
+        num_strikes = np.array([struct.num_strikes() for struct in structs])
+        struct_index = rng.integers(len(structs), size=n)
+        counts = num_strikes[struct_index]
+        # A random permutation of strike slots per client, keeping the
+        # first count slots in ascending order
+        slots = rng.random((n, len(strikes))).argsort(axis=1)
+        slots = np.where(np.arange(len(strikes)) < counts[:, np.newaxis],
+                         slots, len(strikes))
+        slots.sort(axis=1)
+        # Flies take one of the equally spaced strike sets instead
+        flies = strike_sets(Structure.FLY, strikes)
+        fly = structs.index(Structure.FLY)
+        fly_picks = rng.integers(len(flies), size=n).tolist()
+        draws = [rng.integers(len(choices), size=n).tolist()
+                 for choices in (cls.directions, cls.aggressions, cls.peaks,
+                                 cls.totals)]
+        return [cls(Option(list(flies[pick]) if index == fly else
+                           [strikes[slot] for slot in row[:count]],
+                           structs[index], board),
+                    cls.directions[dirn], cls.aggressions[agg],
+                    cls.peaks[peak], cls.totals[total])
+                for row, count, index, pick, dirn, agg, peak, total
+                in zip(slots.tolist(), counts.tolist(),
+                       struct_index.tolist(), fly_picks, *draws)]
+
     def __init__(self, opt, dirn, agg, peak, total):
         self.option = opt
         self.direction = dirn
@@ -83,24 +140,33 @@ class IcebergOrder(object):
         self.peak = peak
         self.total = total
 
-    def pop(self, size=None):
-        opt = self.option
-        dirn = self.direction
-        peak = self.peak
-        price = self.get_price()
+    def peek(self, size=None, fair=None):
+        # The next clip, without taking it from the iceberg
         if size is None:
-            size = peak
-        self.total -= size
-        return Order(opt, dirn, price, size)
+            size = self.peak
+        return Order(self.option, self.direction, self.get_price(fair), size)
+
+    def pop(self, size=None, fair=None):
+        order = self.peek(size, fair)
+        self.total -= order.size
+        return order
+
+    def phrases(self):
+        # Phrases shouted while trading this iceberg, for audio prewarming
+        order = self.peek()
+        return [str(order), order.take_str()]
 
     def is_empty(self):
         return self.total <= 0
 
-    def get_price(self):
+    def get_price(self, fair=None):
+        # Limit price, optionally off an already known fair value
         opt = self.option
         dirn = self.direction
         agg = self.aggression
-        return OptionPrice((1 + dirn.value * agg) * opt.get_price())
+        if fair is None:
+            fair = opt.get_price()
+        return OptionPrice((1 + dirn.value * agg) * fair)
 
     def __str__(self):
         opt = self.option
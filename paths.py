@@ -0,0 +1,153 @@
+from columns import round_to_tick
+import math
+import time
+import numpy as np
+import settings
+
+# One tick per second of a 6.5 hour trading day, in years
+seconds_per_year = 252 * 6.5 * 3600
+
+
+class GBM(object):
+    """
+    Geometric Brownian motion: log-spot increments are iid normal with
+    drift (mu - sigma**2 / 2) * dt and standard deviation sigma * sqrt(dt)
+    """
+
+    def __init__(self, sigma, mu=0.0, dt=1 / seconds_per_year):
+        self.sigma = sigma
+        self.mu = mu
+        self.dt = dt
+
+    def drift(self):
+        return (self.mu - 0.5 * self.sigma ** 2) * self.dt
+
+    def log_path(self, rng, x0, n):
+        # Log-spots for the n ticks after log-spot x0
+        steps = rng.standard_normal(n)
+        steps *= self.sigma * math.sqrt(self.dt)
+        steps += self.drift()
+        return x0 + np.cumsum(steps)
+
+
+class JumpDiffusion(GBM):
+    """
+    Merton jump-diffusion: GBM plus Poisson jumps with normal log sizes,
+    drift-compensated so that mu remains the expected return
+    """
+
+    def __init__(self, sigma, mu=0.0, dt=1 / seconds_per_year,
+                 intensity=50.0, jump_mean=0.0, jump_std=0.01):
+        GBM.__init__(self, sigma, mu, dt)
+        self.intensity = intensity
+        self.jump_mean = jump_mean
+        self.jump_std = jump_std
+
+    def drift(self):
+        mean_jump = math.exp(self.jump_mean + 0.5 * self.jump_std ** 2) - 1
+        return GBM.drift(self) - self.intensity * mean_jump * self.dt
+
+    def log_path(self, rng, x0, n):
+        # Jumps are rare, so draw their total count and scatter them
+        # uniformly over the ticks rather than a Poisson draw per tick
+        num_jumps = rng.poisson(self.intensity * self.dt * n)
+        where = rng.integers(n, size=num_jumps)
+        sizes = rng.normal(self.jump_mean, self.jump_std, num_jumps)
+        jumps = np.bincount(where, weights=sizes, minlength=n)
+        return GBM.log_path(self, rng, x0, n) + np.cumsum(jumps)
+
+
+class MeanReverting(object):
+    """
+    Ornstein-Uhlenbeck log-spot reverting to log(level) at rate speed,
+    sampled exactly so any dt is stable. The AR(1) recursion is solved in
+    blocks: a scaled cumulative sum within each block, then one carry per
+    block, keeping the scale factors far from overflow.
+    """
+    block = 1024
+
+    def __init__(self, sigma, level, speed=10.0, dt=1 / seconds_per_year):
+        self.sigma = sigma
+        self.level = level
+        self.speed = speed
+        self.dt = dt
+
+    def log_path(self, rng, x0, n):
+        decay = math.exp(-self.speed * self.dt)
+        std = self.sigma * math.sqrt((1 - decay ** 2) / (2 * self.speed))
+        mean = math.log(self.level)
+        # Short enough blocks that decay**-block stays representable
+        block = max(1, min(self.block, int(50 / (self.speed * self.dt))))
+        num_blocks = -(-n // block)
+        noise = rng.standard_normal(num_blocks * block).reshape(num_blocks,
+                                                                block)
+        noise *= std
+        # Within a block, z_j = sum_k decay**(j - k) * noise_k
+        powers = decay ** np.arange(block)
+        z = powers * np.cumsum(noise / powers, axis=1)
+        # Deviation from the mean carried into the start of each block
+        carries = np.empty(num_blocks)
+        carry = x0 - mean
+        last = z[:, -1].tolist()
+        decay_block = decay ** block
+        for i in range(num_blocks):
+            carries[i] = carry
+            carry = decay_block * carry + last[i]
+        path = mean + z + carries[:, np.newaxis] * (decay * powers)
+        return path.ravel()[:n]
+
+
+def paths(model, S0=None, n=10 ** 6, seed=None, chunk_size=1 << 20,
+          tick=None):
+    """
+    Stream n spot ticks from model as tick-rounded float arrays of at most
+    chunk_size. The path itself is carried unrounded between chunks, so
+    rounding never accumulates. S0 and tick default to the board settings
+    """
+    configs = settings.board
+    if S0 is None:
+        S0 = configs.stock
+    if tick is None:
+        tick = configs.tick
+    rng = np.random.default_rng(seed)
+    x = math.log(S0)
+    while n > 0:
+        size = min(n, chunk_size)
+        log_spots = model.log_path(rng, x, size)
+        x = log_spots[-1]
+        n -= size
+        yield round_to_tick(np.exp(log_spots), tick)
+
+
+def spots(model, S0=None, n=10 ** 6, seed=None, **kwargs):
+    # Spot ticks one at a time as Python floats
+    for chunk in paths(model, S0, n, seed, **kwargs):
+        yield from chunk.tolist()
+
+
+def drive(board, model, n, seed=None, taylor=True, **kwargs):
+    """
+    Move a PriceBoard or MarketBoard in place along a simulated path,
+    yielding it after each tick on which spot changed
+    """
+    last = None
+    for S in spots(model, float(board.S), n, seed, **kwargs):
+        if S != last:
+            board.update_spot(S, taylor)
+            last = S
+            yield board
+
+
+if __name__ == '__main__':
+    sigma = settings.board.vol
+    models = {'gbm': GBM(sigma),
+              'jumps': JumpDiffusion(sigma),
+              'mean reverting': MeanReverting(sigma, settings.board.stock)}
+    for name, model in models.items():
+        start = time.perf_counter()
+        total = 0
+        for chunk in paths(model, n=10 ** 7, seed=0):
+            total += len(chunk)
+            last = chunk[-1]
+        elapsed = time.perf_counter() - start
+        print(f'{name:<20} {total} ticks in {elapsed:.2f}s, last {last:.2f}')
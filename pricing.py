@@ -0,0 +1,286 @@
+from collections import namedtuple
+import numpy as np
+
+# Chebyshev fit to erfc, fractional error below 1.2e-7 (Numerical Recipes)
+erfc_coeffs = (-1.26551223, 1.00002368, 0.37409196, 0.09678418, -0.18628806,
+               0.27886807, -1.13520398, 1.48851587, -0.82215223, 0.17087277)
+BSGrid = namedtuple('BSGrid', ['call', 'put', 'calldelta', 'gamma', 'vega',
+                               'calltheta', 'puttheta'])
+# Per-leg Greeks, in the column order of leg_greeks
+greek_names = ('delta', 'gamma', 'vega', 'theta')
+
+
+def Phi(x):
+    # Standard normal CDF, vectorised without importing scipy
+    z = np.abs(x) / np.sqrt(2)
+    t = 1 / (1 + 0.5 * z)
+    poly = np.zeros_like(t)
+    for coeff in reversed(erfc_coeffs):
+        poly = coeff + t * poly
+    erfc = t * np.exp(-z * z + poly)
+    return np.where(x >= 0, 1 - 0.5 * erfc, 0.5 * erfc)
+
+
+def phi(x):
+    # Standard normal density
+    return np.exp(-0.5 * x ** 2) / np.sqrt(2 * np.pi)
+
+
+def PV(arr, r, t):
+    # Present value of arr under continuous compounding
+    return arr * np.exp(-r * t)
+
+
+def strike_grid(S, box, num_strikes=5):
+    """
+    Strikes centred on the at-the-money box for each spot.
+    Returns an array of shape S.shape + (num_strikes,)
+    """
+    S = np.asarray(S, dtype=float)
+    box = np.asarray(box, dtype=float)
+    atm = box * np.round(S / box)
+    offsets = np.arange(num_strikes) - num_strikes // 2
+    return atm[..., np.newaxis] + box[..., np.newaxis] * offsets
+
+
+def black_scholes(S, K, sigma, r, t):
+    """
+    Broadcasted Black-Scholes pass over arrays of spots, strikes, vols,
+    rates and expiries (in years). Inputs follow numpy broadcasting rules,
+    so e.g. S[:, None] against K[None, :] prices a spot-by-strike grid.
+    Greeks come from the same d1/d2: vega is per unit of vol and theta
+    per year of calendar decay
+    """
+    S, K, sigma, r, t = np.broadcast_arrays(*(np.asarray(x, dtype=float)
+                                              for x in (S, K, sigma, r, t)))
+    vol_time = sigma * np.sqrt(t)
+    d_plus = (np.log(S / K) + (r + 0.5 * sigma ** 2) * t) / vol_time
+    d_minus = d_plus - vol_time
+    PVK = PV(K, r, t)
+    N_plus = Phi(d_plus)
+    N_minus = Phi(d_minus)
+    call = N_plus * S - N_minus * PVK
+    # Put via put-call parity reuses the two CDF evaluations
+    put = call - S + PVK
+    density = phi(d_plus)
+    gamma = density / (S * vol_time)
+    vega = S * density * np.sqrt(t)
+    decay = -0.5 * S * density * sigma / np.sqrt(t)
+    calltheta = decay - r * PVK * N_minus
+    puttheta = calltheta + r * PVK
+    return BSGrid(call, put, N_plus, gamma, vega, calltheta, puttheta)
+
+
+class VolSmile(object):
+    """
+    Vol quadratic in log-moneyness k = log(K / F) with a power-law term
+    structure:
+
+        sigma(K, t) = atm * (t / ref)**term
+                      + (skew * k + curvature * k**2) / sqrt(t / ref)
+
+    so the skew flattens for longer expiries. Evaluation broadcasts over
+    strikes, expiries and forwards, and recent evaluations are cached
+    until the parameters change.
+    """
+    ref_expiry = 0.25
+    floor = 0.01
+    cache_size = 64
+
+    def __init__(self, atm, skew=0.0, curvature=0.0, term=0.0):
+        self.cache = {}
+        self.set(atm=atm, skew=skew, curvature=curvature, term=term)
+
+    @classmethod
+    def from_settings(cls, configs):
+        return cls(configs.vol, configs.skew, configs.curvature,
+                   configs.term)
+
+    def set(self, **params):
+        # Change parameters, dropping any cached evaluations
+        for name, value in params.items():
+            if name not in ('atm', 'skew', 'curvature', 'term'):
+                raise KeyError('Unrecognised smile parameter: ', name)
+            setattr(self, name, float(value))
+        self.cache.clear()
+        return self
+
+    def is_flat(self):
+        return self.skew == self.curvature == self.term == 0
+
+    def evaluate(self, K, t, F):
+        K, t, F = (np.asarray(x, dtype=float) for x in (K, t, F))
+        k = np.log(K / F)
+        scale = t / self.ref_expiry
+        sigma = (self.atm * scale ** self.term +
+                 (self.skew * k + self.curvature * k ** 2) / np.sqrt(scale))
+        return np.maximum(sigma, self.floor)
+
+    def forward_slopes(self, K, t, F):
+        """
+        First and second derivatives of the smile in log forward, with
+        the smile moving with the forward as k = log(K / F) falls. Zero
+        where the vol is floored
+        """
+        K, t, F = (np.asarray(x, dtype=float) for x in (K, t, F))
+        k = np.log(K / F)
+        root = np.sqrt(t / self.ref_expiry)
+        live = self.evaluate(K, t, F) > self.floor
+        slope = -(self.skew + 2 * self.curvature * k) / root
+        curve = 2 * self.curvature / root
+        return np.where(live, slope, 0.0), np.where(live, curve, 0.0)
+
+    def __call__(self, K, t, F):
+        # Cached on the exact inputs, which repeat while spot is unchanged
+        arrays = [np.asarray(x, dtype=float) for x in (K, t, F)]
+        key = tuple((x.tobytes(), x.shape) for x in arrays)
+        sigma = self.cache.get(key)
+        if sigma is None:
+            if len(self.cache) >= self.cache_size:
+                self.cache.pop(next(iter(self.cache)))
+            sigma = self.cache[key] = self.evaluate(*arrays)
+        return sigma
+
+
+def smile_adjusted(grid, S, K, sigma, r, t, slope, curve):
+    """
+    Black-Scholes grid whose delta and gamma include each strike's vol
+    moving with spot, given the smile's first and second derivatives in
+    log forward, e.g. from VolSmile.forward_slopes. Black-Scholes Greeks
+    alone are sticky strike; these match repricing off the moved smile
+    """
+    S, K, sigma, r, t = np.broadcast_arrays(*(np.asarray(x, dtype=float)
+                                              for x in (S, K, sigma, r, t)))
+    vol_time = sigma * np.sqrt(t)
+    d_plus = (np.log(S / K) + (r + 0.5 * sigma ** 2) * t) / vol_time
+    d_minus = d_plus - vol_time
+    vanna = -phi(d_plus) * d_minus / sigma
+    volga = grid.vega * d_plus * d_minus / sigma
+    # d/dS = (1 / S) d/dlogF, since the forward is proportional to spot
+    dsigma = slope / S
+    d2sigma = (curve - slope) / S ** 2
+    return grid._replace(
+        calldelta=grid.calldelta + grid.vega * dsigma,
+        gamma=(grid.gamma + 2 * vanna * dsigma + volga * dsigma ** 2 +
+               grid.vega * d2sigma))
+
+
+def leg_greeks(grid):
+    """
+    Greeks of the calls then the puts at each strike of a one-board grid,
+    as an array of shape (2 * strikes, len(greek_names)) whose rows match
+    Board.leg_values
+    """
+    calls = np.stack([grid.calldelta, grid.gamma, grid.vega, grid.calltheta],
+                     axis=-1)
+    puts = np.stack([grid.calldelta - 1, grid.gamma, grid.vega,
+                     grid.puttheta], axis=-1)
+    return np.concatenate([calls, puts])
+
+
+def solve_vol(value, targets, guess=None, bounds=(1e-3, 5.0), tol=1e-8,
+              max_iter=100, min_vega=1e-4):
+    """
+    Vectorised safeguarded Newton iteration for the vols at which
+    value(sigma, index) = (prices, vegas) meets targets, for a 1-d array
+    of targets. Each element keeps a bracket within bounds; a Newton step
+    that leaves its bracket or has no vega bisects instead. guess warm
+    starts the iteration, e.g. from the previous tick's vols. Elements
+    with no root strictly inside bounds are NaN, as are roots with less
+    than min_vega, e.g. options at intrinsic, whose price pins down no vol
+    """
+    targets = np.asarray(targets, dtype=float)
+    everything = np.arange(targets.size)
+    lo = np.full(targets.size, float(bounds[0]))
+    hi = np.full(targets.size, float(bounds[1]))
+    with np.errstate(invalid='ignore'):
+        f_lo = value(lo, everything)[0] - targets
+        f_hi = value(hi, everything)[0] - targets
+        # Targets at either end of the range, e.g. intrinsic, or prices
+        # that barely move across it pin down no vol
+        solvable = (np.isfinite(targets) & (f_lo * f_hi < 0) &
+                    (np.minimum(np.abs(f_lo), np.abs(f_hi)) > tol))
+    # Orient each bracket so that value - target is negative at lo
+    rising = f_lo <= 0
+    lo, hi = np.where(rising, lo, hi), np.where(rising, hi, lo)
+    sigma = 0.5 * (lo + hi)
+    if guess is not None:
+        guess = np.broadcast_to(np.asarray(guess, dtype=float), sigma.shape)
+        inside = (guess - lo) * (guess - hi) < 0
+        sigma = np.where(inside, guess, sigma)
+    result = np.full(targets.size, np.nan)
+    active = everything[solvable]
+    for _ in range(max_iter):
+        if not active.size:
+            break
+        x = sigma[active]
+        prices, vegas = value(x, active)
+        f = prices - targets[active]
+        below = f < 0
+        lo[active] = np.where(below, x, lo[active])
+        hi[active] = np.where(below, hi[active], x)
+        lo_a = lo[active]
+        hi_a = hi[active]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            newton = x - f / vegas
+            inside = np.isfinite(newton) & ((newton - lo_a) *
+                                            (newton - hi_a) < 0)
+        sigma[active] = np.where(inside, newton, 0.5 * (lo_a + hi_a))
+        done = (np.abs(f) < tol) | (np.abs(hi_a - lo_a) < tol)
+        result[active[done]] = np.where(np.abs(vegas[done]) >= min_vega,
+                                        x[done], np.nan)
+        active = active[~done]
+    result[active] = sigma[active]
+    return result
+
+
+def implied_vol(prices, S, K, r, t, call=True, guess=None, **kwargs):
+    """
+    Black-Scholes implied vols for arrays of call (or put) prices, with
+    all inputs broadcast together as in black_scholes. Prices outside the
+    no-arbitrage bounds give NaN
+    """
+    arrays = np.broadcast_arrays(*(np.asarray(x, dtype=float)
+                                   for x in (prices, S, K, r, t, call)))
+    shape = arrays[0].shape
+    prices, S, K, r, t, call = (x.ravel() for x in arrays)
+    call = call.astype(bool)
+
+    def value(sigma, index):
+        grid = black_scholes(S[index], K[index], sigma, r[index], t[index])
+        return np.where(call[index], grid.call, grid.put), grid.vega
+
+    if guess is not None:
+        guess = np.broadcast_to(np.asarray(guess, dtype=float), shape).ravel()
+    return solve_vol(value, prices, guess, **kwargs).reshape(shape)
+
+
+def price_boards(spots, expiries, sigma, r, box, num_strikes=5):
+    """
+    Price whole boards for many underlyings and expiries in one pass.
+    Returns (strikes, grid) where strikes has shape (spots, strikes) and
+    each array of grid has shape (spots, expiries, strikes). sigma may be
+    a flat vol or a VolSmile
+    """
+    spots = np.atleast_1d(np.asarray(spots, dtype=float))
+    expiries = np.atleast_1d(np.asarray(expiries, dtype=float))
+    strikes = strike_grid(spots, box, num_strikes)
+    S = spots[:, np.newaxis, np.newaxis]
+    K = strikes[:, np.newaxis, :]
+    t = expiries[np.newaxis, :, np.newaxis]
+    if callable(sigma):
+        sigma = sigma(K, t, S * np.exp(r * t))
+    grid = black_scholes(S, K, sigma, r, t)
+    return strikes, grid
+
+
+if __name__ == '__main__':
+    strikes, grid = price_boards([50, 75, 100], [0.1, 0.25, 0.5],
+                                 sigma=0.4, r=0.1, box=5)
+    print(strikes)
+    print(grid.call.round(2))
+    smile = VolSmile(0.4, skew=-0.1, curvature=0.2, term=-0.1)
+    print(price_boards([75], [0.1, 0.25, 0.5], smile, r=0.1, box=5)[1]
+          .call.round(2))
+    expiries = np.array([0.1, 0.25, 0.5])[:, np.newaxis]
+    print(implied_vol(grid.call[1], 75, strikes[1], 0.1, expiries).round(4))
@@ -0,0 +1,125 @@
+from currencies import Price
+from markets import Market
+from strings import spaces
+import sys
+
+CSI = "\033["
+header = (spaces(5) + "PutsAndStock        Call        " + "|  Strike   |" +
+          "        Put         Buywrite")
+# Starting column of each cell on a strike line, matching the layout of
+# MarketBoard.__str__
+layout = {"put&stock": 7, "call": 22, "left": 37, "strike": 42, "right": 49,
+          "put": 54, "buywrite": 69}
+market_cols = ["put&stock", "call", "put", "buywrite"]
+
+
+def null_key(x):
+    # NaN never equals itself, so map it to None for use in dict keys
+    return x if x == x else None
+
+
+class BoardRenderer(object):
+    """
+    Draws a MarketBoard on an ANSI terminal by diffing each frame against
+    the last one drawn. A frame maps (line, column) cells to text, laid
+    out as in MarketBoard.__str__, and only cells whose text changed are
+    rewritten with cursor-addressed updates. Cell text is cached on the
+    raw bid/ask floats, so a market is formatted once however many frames
+    it appears in.
+    """
+    max_cached = 1 << 14
+
+    def __init__(self, board, out=None):
+        self.board = board
+        self.out = sys.stdout if out is None else out
+        self.texts = {}
+        self.last = None
+
+    def text(self, key, make):
+        texts = self.texts
+        text = texts.get(key)
+        if text is None:
+            if len(texts) >= self.max_cached:
+                texts.clear()
+            text = texts[key] = make()
+        return text
+
+    def market_text(self, bid, ask):
+        key = (null_key(bid), null_key(ask))
+        return self.text(key, lambda: str(Market(bid, ask)))
+
+    def frame(self):
+        # Text of every cell in the visible window
+        board = self.board
+        df = board.df
+        cells = {(0, 0): board.get_stock_and_rc(), (1, 0): header}
+        lo, hi = board.window_rows()
+        strikes = df.index[lo:hi].tolist()
+        for col in market_cols:
+            arrays = df[col].array.arrays()
+            start = layout[col]
+            for i, (bid, ask) in enumerate(zip(arrays["bid"][lo:hi].tolist(),
+                                               arrays["ask"][lo:hi].tolist())):
+                cells[(2 + 2 * i, start)] = self.market_text(bid, ask)
+        spreads = df["callspread"].array.arrays()["price"][lo:hi].tolist()
+        for i, strike in enumerate(strikes):
+            line = 2 + 2 * i
+            cells[(line, layout["left"])] = "|"
+            cells[(line, layout["strike"])] = "{:3d}".format(strike)
+            cells[(line, layout["right"])] = "|"
+            if i < len(strikes) - 1:
+                spread = spreads[i]
+                cells[(line + 1, 0)] = self.text(
+                    ("spread", null_key(spread)),
+                    lambda: "{}<".format(Price(spread)))
+        line = 2 * len(strikes) + 1
+        cells[(line, 0)] = f"{board.get_straddle()}: {board.V}"
+        for order in board.bot_orders.values():
+            line += 1
+            cells[(line, 0)] = str(order)
+        return cells
+
+    def invalidate(self):
+        # Force a full redraw, e.g. after other output has scrolled
+        self.last = None
+
+    def updates(self, cells):
+        # Escape sequences turning the last frame into this one
+        last = self.last
+        if last is None:
+            parts = [CSI + "2J"]
+            last = {}
+        else:
+            parts = []
+        for pos, text in cells.items():
+            old = last.get(pos)
+            if old != text:
+                if old is not None and len(old) > len(text):
+                    text = text + spaces(len(old) - len(text))
+                parts.append(f"{CSI}{pos[0] + 1};{pos[1] + 1}H{text}")
+        for pos, old in last.items():
+            if pos not in cells:
+                parts.append(f"{CSI}{pos[0] + 1};{pos[1] + 1}H"
+                             f"{spaces(len(old))}")
+        # Park the cursor under the board and clear the prompt area
+        end = max(line for line, _ in cells) + 2
+        parts.append(f"{CSI}{end};1H{CSI}J")
+        return "".join(parts)
+
+    def draw(self):
+        cells = self.frame()
+        self.out.write(self.updates(cells))
+        self.out.flush()
+        self.last = cells
+        return self
+
+
+if __name__ == "__main__":
+    import time
+    from boards import MarketBoard
+    board = MarketBoard()
+    renderer = BoardRenderer(board)
+    for _ in range(100):
+        board.reprice(0.05, taylor=True)
+        renderer.draw()
+        time.sleep(0.05)
@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+from game_logging import Recorder, board_fields, read_events, unpack_option
+from order_types import Direction, Order
+from structures import Option
+
+
+class Replay(object):
+    """
+    Deterministic replay of a session recorded by Recorder, headless and
+    at full speed: no audio, no input and no countdowns. The start event
+    rebuilds the fair board exactly, from the recorded parameters and
+    expiry rather than the clock or board.yml, and each later event is
+    applied to a fresh PublicBoard and Ledger as it happened in the game.
+    """
+
+    def __init__(self, fpath=None):
+        if fpath is None:
+            fpath = os.path.join(Recorder.dir_name, Recorder.events_name)
+        self.fpath = fpath
+        self.seed = None
+        self.board = None
+        self.ledger = None
+        self.seq = -1
+
+    def start(self, fields):
+        import settings
+        from boards import PriceBoard, PublicBoard
+        from ledger import Ledger
+        seed, *values = fields
+        params = dict(zip(board_fields, values))
+        for name in ('box', 'strikes'):
+            params[name] = int(params[name])
+        S = params.pop('stock')
+        expiry = params.pop('expiry')
+        with settings.board.overriding(**params):
+            self.board = PublicBoard(PriceBoard(S, expiry))
+        self.seed = seed
+        self.ledger = Ledger()
+
+    def option(self, fields):
+        structure, strikes = unpack_option(fields)
+        return Option(strikes, structure, self.board.fair)
+
+    def apply(self, event):
+        kind, fields = event.kind, event.fields
+        if kind == b'G':
+            self.start(fields)
+        elif self.board is None:
+            raise ValueError('Session does not start with a board: ',
+                             self.fpath)
+        elif kind == b'S':
+            self.board.update_spot(fields[0])
+        elif kind == b'F':
+            self.ledger.record(self.option(fields), Direction(fields[4]),
+                               fields[5], fields[6])
+        elif kind == b'R':
+            self.board.append(Order(self.option(fields),
+                                    Direction(fields[4]), fields[5],
+                                    fields[6]))
+        self.seq = event.seq
+        return event
+
+    def events(self, stop=None):
+        # Apply and yield each event in turn, up to event number stop
+        for event in read_events(self.fpath):
+            if stop is not None and event.seq >= stop:
+                return
+            yield self.apply(event)
+
+    def run(self, stop=None):
+        # Replay the whole session, or up to event number stop
+        for _ in self.events(stop):
+            pass
+        return self
+
+    def mark(self):
+        return self.ledger.mark(self.board.fair, self.board)
+
+
+def show(fpath, start=0, count=20):
+    # Print count events from event number start, seeking via the index
+    for event in read_events(fpath, start):
+        if event.seq >= start + count:
+            break
+        fields = event.fields
+        if event.kind in (b'Q', b'M', b'F', b'R'):
+            structure, strikes = unpack_option(fields)
+            fields = (list(strikes), str(structure)) + fields[4:]
+        print(f'{event.seq:>8} {event.kind.decode()} {fields}')
+
+
+if __name__ == '__main__':
+    fpath = sys.argv[1] if len(sys.argv) > 1 else None
+    start = time.perf_counter()
+    replay = Replay(fpath).run()
+    elapsed = time.perf_counter() - start
+    mark = replay.mark()
+    print(f'{replay.seq + 1} events in {elapsed:.3f}s, seed {replay.seed}')
+    print(replay.ledger)
+    print(f'P&L {mark.pnl:.2f} (mids {mark.mid_pnl:.2f}), '
+          f'delta {mark.delta:.1f}, vega {mark.vega:.1f}')
+    if len(sys.argv) > 2:
+        show(replay.fpath, int(sys.argv[2]))
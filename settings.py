@@ -0,0 +1,147 @@
+import contextlib
+import os
+import time
+
+board_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'configs', 'board.yml')
+# Setting names mapped to their keys in board.yml
+keys = {'stock': 'stock', 'rate': 'int', 'vol': 'vol', 'box': 'box',
+        'skew': 'skew', 'curvature': 'curvature', 'term': 'term',
+        'strikes': 'strikes', 'tick': 'tick'}
+# Values for settings that older config files may not define
+defaults = {'skew': 0.0, 'curvature': 0.0, 'term': 0.0, 'strikes': 5,
+            'tick': 0.05}
+
+
+class Config(object):
+    """
+    Process-wide cache of a YAML config file, revalidated against the
+    file's mtime at most once every check_interval seconds. Overrides are
+    held in memory and take precedence over the file.
+    """
+    check_interval = 1.0
+
+    def __init__(self, path=board_path):
+        self.path = path
+        self.overrides = {}
+        self.values = None
+        self.mtime = None
+        self.checked = None
+
+    def reload(self):
+        # Re-read the file unconditionally
+        import yaml
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, 'r') as stream:
+            try:
+                values = yaml.safe_load(stream) or {}
+            except yaml.YAMLError as e:
+                if self.values is None:
+                    raise
+                print(e)
+                values = self.values
+        self.values = values
+        self.mtime = mtime
+        self.checked = time.monotonic()
+        return self
+
+    def validate(self):
+        # Reload if the file has changed since it was last read
+        if self.values is None:
+            return self.reload()
+        now = time.monotonic()
+        if now - self.checked >= self.check_interval:
+            self.checked = now
+            if os.stat(self.path).st_mtime != self.mtime:
+                return self.reload()
+        return self
+
+    def __getitem__(self, name):
+        if name in self.overrides:
+            return self.overrides[name]
+        values = self.validate().values
+        key = keys.get(name, name)
+        if key not in values and name in defaults:
+            return defaults[name]
+        return values[key]
+
+    def set(self, **overrides):
+        # Override settings in memory without touching the file
+        for name in overrides:
+            if name not in keys:
+                raise KeyError('Unrecognised setting: ', name)
+        self.overrides.update(overrides)
+        return self
+
+    def clear(self, *names):
+        # Drop the given overrides, or all of them
+        if not names:
+            names = list(self.overrides)
+        for name in names:
+            self.overrides.pop(name, None)
+        return self
+
+    def snapshot(self):
+        # Current value of every setting, e.g. to pin them in a subprocess
+        return {name: self[name] for name in keys}
+
+    @contextlib.contextmanager
+    def overriding(self, **overrides):
+        # Temporarily override settings, e.g. to sweep vols in a simulation
+        previous = dict(self.overrides)
+        self.set(**overrides)
+        try:
+            yield self
+        finally:
+            self.overrides = previous
+
+    @property
+    def stock(self):
+        return self['stock']
+
+    @property
+    def rate(self):
+        return self['rate']
+
+    @property
+    def vol(self):
+        return self['vol']
+
+    @property
+    def box(self):
+        return self['box']
+
+    @property
+    def skew(self):
+        return self['skew']
+
+    @property
+    def curvature(self):
+        return self['curvature']
+
+    @property
+    def term(self):
+        return self['term']
+
+    @property
+    def strikes(self):
+        return self['strikes']
+
+    @property
+    def tick(self):
+        return self['tick']
+
+
+board = Config()
+
+
+def reload():
+    # Explicit hook to pick up edits to board.yml immediately
+    return board.reload()
+
+
+if __name__ == '__main__':
+    print(board.stock, board.rate, board.vol, board.box, board.skew,
+          board.curvature, board.term)
+    with board.overriding(vol=0.25):
+        print(board.vol)
@@ -0,0 +1,153 @@
+from collections import namedtuple
+from boards import MarketBoard, PriceBoard
+from markets import Market
+from matching import is_book_crossed
+from order_types import Direction, IcebergOrder
+import time
+import numpy as np
+
+# A player trade; direction is the player's side and edge is per lot vs fair
+Trade = namedtuple('Trade', ['option', 'direction', 'price', 'size', 'fair',
+                             'edge'])
+# crossed is the lots client orders traded with each other in the book
+GameResult = namedtuple('GameResult', ['pnl', 'fills', 'lots', 'edge',
+                                       'orders', 'trades', 'crossed'])
+
+
+def fair_market(order, sim):
+    # Quote the widest legal market around fair value
+    return Market.from_price(sim.fair(order.option))
+
+
+def pass_market(order, sim):
+    # Never quote, leaving every order in the book
+    return None
+
+
+class Simulation(object):
+    """
+    Headless Mock: the same clients, boards and order books as game.Mock,
+    driven by an iterative loop with no terminal, audio or input(). The
+    player is a strategy callback strategy(order, sim) returning a
+    Market, or None to let the order rest in the book; sim.board is the
+    public board and sim.fair(option) the fair value. Settlement follows
+    user_input.get_user_market: a bid above fair or an ask below fair is
+    lifted immediately, otherwise the client trades if its order crosses.
+    Given a ResultsStore, every client order and its outcome is added to
+    it as a row for analytics.
+    """
+    num_clients = 5
+
+    def __init__(self, strategy=fair_market, board=None, seed=None,
+                 store=None):
+        if board is None:
+            board = MarketBoard(board=PriceBoard())
+        self.strategy = strategy
+        self.board = board
+        self.rng = np.random.default_rng(seed)
+        self.store = store
+        # Fair values per option; the fair board is fixed during a run
+        self.fairs = {}
+
+    def fair(self, option):
+        fair = self.fairs.get(option)
+        if fair is None:
+            fair = self.fairs[option] = float(option.get_price())
+        return fair
+
+    def new_clients(self):
+        return IcebergOrder.rand_many(self.board.fair, self.num_clients,
+                                      self.rng)
+
+    def settle(self, order, mkt, fair):
+        # The player's trade against a client order, or None
+        if mkt is None:
+            return None
+        if mkt.bid > fair:
+            dirn, price = Direction.BUY, mkt.bid
+        elif mkt.ask < fair:
+            dirn, price = Direction.SELL, mkt.ask
+        elif is_book_crossed(order, mkt):
+            if order.direction is Direction.BUY:
+                dirn, price = Direction.SELL, mkt.ask
+            else:
+                dirn, price = Direction.BUY, mkt.bid
+        else:
+            return None
+        price = float(price)
+        return Trade(order.option, dirn, price, order.size, fair,
+                     int(dirn) * (fair - price))
+
+    def play(self, clients=None):
+        # Play one game to completion and return its GameResult
+        if clients is None:
+            clients = self.new_clients()
+        board = self.board
+        board.books = {}
+        integers = self.rng.integers
+        strategy = self.strategy
+        store = self.store
+        trades = []
+        orders = 0
+        crossed = 0
+        while clients:
+            client = clients[integers(len(clients))]
+            fair = self.fair(client.option)
+            order = client.pop(fair=fair)
+            if client.is_empty():
+                clients.remove(client)
+            orders += 1
+            mkt = strategy(order, self)
+            trade = self.settle(order, mkt, fair)
+            if store is not None:
+                store.add(client, order, fair, mkt, trade)
+            if trade is None:
+                for fill in board.append(order):
+                    crossed += fill.size
+            else:
+                trades.append(trade)
+        if store is not None:
+            store.end_game()
+        return self.result(trades, orders, crossed)
+
+    def result(self, trades, orders, crossed=0):
+        pnl = sum(trade.edge * trade.size for trade in trades)
+        lots = sum(trade.size for trade in trades)
+        edge = pnl / lots if lots else 0.0
+        return GameResult(pnl, len(trades), lots, edge, orders, trades,
+                          crossed)
+
+    def run(self, num_games):
+        # Play num_games independent games, yielding each GameResult
+        for _ in range(num_games):
+            yield self.play()
+
+
+def summarise(results):
+    # Aggregate P&L, fills and edge over an iterable of GameResults
+    games = pnl = fills = lots = orders = crossed = 0
+    for result in results:
+        games += 1
+        crossed += result.crossed
+        pnl += result.pnl
+        fills += result.fills
+        lots += result.lots
+        orders += result.orders
+    return {'games': games,
+            'pnl/game': pnl / games if games else 0.0,
+            'fills/game': fills / games if games else 0.0,
+            'orders/game': orders / games if games else 0.0,
+            'crossed/game': crossed / games if games else 0.0,
+            'edge/lot': pnl / lots if lots else 0.0}
+
+
+if __name__ == '__main__':
+    for strategy in [fair_market, pass_market]:
+        sim = Simulation(strategy, seed=0)
+        start = time.perf_counter()
+        stats = summarise(sim.run(1000))
+        elapsed = time.perf_counter() - start
+        print(strategy.__name__)
+        for name, value in stats.items():
+            print(f'    {name:<20} {value:>12.2f}')
+        print(f'    {"games/s":<20} {stats["games"] / elapsed:>12.0f}')
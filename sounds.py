@@ -1,7 +1,16 @@
-from gtts import gTTS
-import random
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import atexit
+import functools
+import hashlib
+import shutil
+import statistics
 import sys
 import os
+import threading
+
+tick_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'clock-ticking.mp3')
 
 
 def audio_path(fname):
@@ -17,69 +26,357 @@ def clear_line():
     sys.stdout.flush()
 
 
-def text_to_mp3(text, mpeg_name):
+def normalise(text):
+    # Spoken form of text, shared by synthesis and cache keys
+    text = (str(text).replace('@', 'at')
+                     .replace('/', ', ')
+                     .replace('\n', ' '))
+    return ' '.join(text.split())
+
+
+class GTTSBackend(object):
+    """
+    Google text-to-speech, needs network access
+    """
+    name = 'gtts'
+
+    def synthesize(self, text, mpeg_path):
+        from gtts import gTTS
+        tts = gTTS(text=text, lang='en')
+        tts.save(mpeg_path)
+
+
+class SilentBackend(object):
+    """
+    Offline backend writing empty clips, for tests and headless runs
+    """
+    name = 'silent'
+
+    def synthesize(self, text, mpeg_path):
+        open(mpeg_path, 'wb').close()
+
+
+backends = {backend.name: backend for backend in [GTTSBackend, SilentBackend]}
+
+
+class AudioCache(object):
+    """
+    Content-addressed cache of synthesized phrases in sound-cache/, keyed
+    by a hash of the backend and normalised text. Missing clips are
+    synthesized on a background worker pool, so phrases can be requested
+    ahead of time and only waited on when they are played.
+    """
+
+    def __init__(self, backend=None, workers=4):
+        if backend is None:
+            backend = backends[os.environ.get('MOCK_TTS', 'gtts')]()
+        self.backend = backend
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def path(self, text):
+        key = f'{self.backend.name}\0{normalise(text)}'.encode()
+        return audio_path(hashlib.sha1(key).hexdigest() + '.mp3')
+
+    def synthesize(self, text, mpeg_path):
+        # Write to a temporary file so readers never see partial clips
+        tmp_path = f'{mpeg_path}.{threading.get_ident()}.tmp'
+        try:
+            self.backend.synthesize(normalise(text), tmp_path)
+            os.replace(tmp_path, mpeg_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with self.lock:
+                del self.pending[mpeg_path]
+        return mpeg_path
+
+    def request(self, text):
+        # Future for the clip's path, synthesizing in the background if new
+        mpeg_path = self.path(text)
+        with self.lock:
+            if mpeg_path in self.pending:
+                return self.pending[mpeg_path]
+            if os.path.isfile(mpeg_path):
+                future = Future()
+                future.set_result(mpeg_path)
+                return future
+            future = self.pool.submit(self.synthesize, text, mpeg_path)
+            self.pending[mpeg_path] = future
+            return future
+
+    def get(self, text):
+        # Path of the clip, blocking only if it is still being synthesized
+        return self.request(text).result()
+
+    def prewarm(self, texts):
+        # Start synthesizing phrases the game is expected to need
+        return [self.request(text) for text in texts]
+
+
+cache = AudioCache()
+
+
+def set_backend(backend):
+    # Swap text-to-speech backend, e.g. SilentBackend() to run offline
+    cache.backend = backend
+    return cache
+
+
+def prewarm(texts):
+    return cache.prewarm(texts)
+
+
+def text_to_mp3(text):
+    """
+    Text-to-speech through the audio cache
+    """
+    return cache.get(text)
+
+
+class NullPlayer(object):
+    """
+    Player for machines without mpg321: clips start and finish at once
+    """
+
+    async def start(self):
+        pass
+
+    async def load(self, mpeg_path):
+        pass
+
+    async def wait(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class Mpg321Player(object):
+    """
+    A single long-lived mpg321 process in remote-control mode (-R), fed
+    LOAD commands, rather than a new subprocess per clip
+    """
+
+    async def start(self):
+        self.proc = await asyncio.create_subprocess_exec(
+            'mpg321', '-R', 'mock',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL)
+        self.started = asyncio.Event()
+        self.stopped = asyncio.Event()
+        self.reader = asyncio.ensure_future(self.read_status())
+
+    async def read_status(self):
+        # @S/@F: stream info/frames, @P 0: stopped, @E: error
+        async for line in self.proc.stdout:
+            if line.startswith((b'@S', b'@F')):
+                self.started.set()
+            elif line.startswith((b'@P 0', b'@E')):
+                self.started.set()
+                self.stopped.set()
+
+    async def load(self, mpeg_path):
+        # Start a clip, returning once playback has begun
+        self.started.clear()
+        self.stopped.clear()
+        self.proc.stdin.write(f'LOAD {mpeg_path}\n'.encode())
+        await self.proc.stdin.drain()
+        await self.started.wait()
+
+    async def wait(self):
+        await self.stopped.wait()
+
+    async def close(self):
+        self.reader.cancel()
+        self.proc.stdin.write(b'QUIT\n')
+        self.proc.stdin.close()
+        try:
+            await asyncio.wait_for(self.proc.wait(), timeout=0.5)
+        except asyncio.TimeoutError:
+            self.proc.kill()
+
+
+class AudioScheduler(object):
     """
-    Google text-to-speech
+    Plays clips in order from an asyncio loop on a background thread, so
+    the game thread never blocks on audio. Clips can be scheduled for a
+    precise start time, and the latency between a clip being due and its
+    playback starting is recorded.
     """
-    mpeg_path = audio_path(mpeg_name)
-    text = (text.replace('@', 'at')
-                .replace('/', ', ')
-                .replace('\n', ' '))
-    tts = gTTS(text=text, lang='en')
-    tts.save(mpeg_path)
+
+    def __init__(self, player=None):
+        self.player = player
+        self.loop = None
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def ensure_running(self):
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True).start()
+                asyncio.run_coroutine_threadsafe(self.setup(), loop).result()
+                self.loop = loop
+                atexit.register(self.close)
+        return self.loop
+
+    def close(self):
+        # Stop the worker and player so no clips are left mid-play at exit
+        future = asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop)
+        future.result(timeout=1)
+
+    async def shutdown(self):
+        self.worker.cancel()
+        await self.player.close()
+
+    async def setup(self):
+        if self.player is None:
+            if shutil.which('mpg321'):
+                self.player = Mpg321Player()
+            else:
+                self.player = NullPlayer()
+        await self.player.start()
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.ensure_future(self.run())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            mpeg_path, due, on_start, future = await self.queue.get()
+            try:
+                if isinstance(mpeg_path, Future):
+                    mpeg_path = await asyncio.wrap_future(mpeg_path)
+                delay = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # Clips queued behind others are due when the player frees up
+                due = max(due, loop.time())
+                audible = os.path.getsize(mpeg_path) > 0
+                if audible:
+                    await self.player.load(mpeg_path)
+                latency = loop.time() - due
+                self.latencies.append(latency)
+                if on_start is not None:
+                    on_start()
+                future.set_result(latency)
+                if audible:
+                    await self.player.wait()
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    def play(self, mpeg_path, delay=0, on_start=None):
+        """
+        Queue a clip (a path, or a Future of one) to start no sooner than
+        delay seconds from now. Returns a Future of its start latency
+        """
+        loop = self.ensure_running()
+        future = Future()
+        item = (mpeg_path, loop.time() + delay, on_start, future)
+        loop.call_soon_threadsafe(self.queue.put_nowait, item)
+        return future
+
+    def countdown(self, beats, beat=1.5, verbose=True):
+        # Tick every beat seconds from now, returning the last tick's Future
+        for i in range(beats, 0, -1):
+            on_start = None
+            if verbose:
+                on_start = functools.partial(self.show_beat, i, beat)
+            future = self.play(tick_path, (beats - i) * beat, on_start)
+        return future
+
+    def show_beat(self, i, beat):
+        # Display the countdown, clearing it a beat after the last tick
+        sys.stdout.write('\r{:d}'.format(i))
+        sys.stdout.flush()
+        if i == 1:
+            self.loop.call_later(beat, clear_line)
+
+    def drain(self):
+        # Block until every queued clip has finished playing
+        loop = self.ensure_running()
+        asyncio.run_coroutine_threadsafe(self.queue.join(), loop).result()
+
+    def latency_report(self):
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {}
+        return {'clips': len(latencies),
+                'mean_ms': 1e3 * statistics.mean(latencies),
+                'p50_ms': 1e3 * latencies[len(latencies) // 2],
+                'p95_ms': 1e3 * latencies[int(0.95 * (len(latencies) - 1))],
+                'max_ms': 1e3 * latencies[-1]}
+
+
+scheduler = AudioScheduler()
 
 
 def play_mp3(mpeg_name, cached=True):
     """
-    Play .mp3 file using mpg321
+    Queue an .mp3 file for playback, returning a Future of its start
     """
     if cached:
         mpeg_path = audio_path(mpeg_name)
     else:
         mpeg_path = mpeg_name
-    if os.path.isfile(mpeg_path):
-        os.system('mpg321 -q ' + mpeg_path)
-    else:
+    if not os.path.isfile(mpeg_path):
         raise IOError('bad mp3 path: ', mpeg_path)
+    return scheduler.play(mpeg_path)
+
+
+def report_failure(future):
+    # Synthesis or playback errors would otherwise vanish with the Future
+    error = future.exception()
+    if error is not None:
+        sys.stderr.write(f'\rAudio unavailable: {error!r}\n')
+        sys.stderr.flush()
 
 
-def shout(text):
+def shout(text, block=False):
     """
-    Play sound from text
+    Print text and queue it to be spoken. Audio failures, e.g. gTTS
+    offline, are reported on stderr and never hide the text
     """
     text = str(text)
-    mpeg_name = (text.replace(' ', '_')
-                     .replace('/', '_')
-                     .replace('\n', '') + '.mp3')
-    print(text)
-    text_to_mp3(text, mpeg_name)
-    play_mp3(mpeg_name)
+    print('\r\033[K' + text)
+    future = scheduler.play(cache.request(text))
+    future.add_done_callback(report_failure)
+    if block:
+        scheduler.drain()
     return text
 
 
-def rand_countdown(beats_min=5, beats_max=30, verbose=True):
+def rand_countdown(beats_min=5, beats_max=20, verbose=True, rng=None):
     """
-    Random countdown after key press
+    Random countdown of beats_min to beats_max beats after key press,
+    running alongside the game thread. rng is a numpy Generator or seed.
+    Returns a Future that completes on the last beat
     """
-    beats_to_wait = random.randint(5, 20)
-    for i in range(beats_to_wait, 0, -1):
-        if verbose:
-            sys.stdout.write('\r{:d}'.format(i))
-            sys.stdout.flush()
-        play_mp3('clock-ticking.mp3', cached=False)
-        clear_line()
+    import numpy as np
+    rng = np.random.default_rng(rng)
+    beats_to_wait = int(rng.integers(beats_min, beats_max + 1))
+    return scheduler.countdown(beats_to_wait, verbose=verbose)
 
 
-def rand_order():
+def rand_order(rng=None):
     """
-    Random order voiced at random time
+    Random order voiced at random time, returning a Future of its text
     """
-    order = random.choice(['mine', 'yours'])
+    import numpy as np
+    rng = np.random.default_rng(rng)
+    order = ['mine', 'yours'][rng.integers(2)]
     order_text = 'Okay...' + order + '!'
-    rand_countdown()
-    shout(order_text)
+    spoken = Future()
+    rand_countdown(rng=rng).add_done_callback(
+        lambda _: spoken.set_result(shout(order_text)))
+    return spoken
 
 
 if __name__ == "__main__":
     start_dialogue = input("Press Enter when ready")
-    rand_order()
+    rand_order().result()
+    scheduler.drain()
@@ -1,7 +1,8 @@
-from currencies import Price
-import random
+from currencies import Immutable, Price, readonly
 import enum
-import numpy as np
+import itertools
+import math
+import numbers
 
 
 @enum.unique
@@ -13,6 +14,8 @@ class Structure(enum.Enum):
     CALLSPREAD = 'call spread'
     PUTSPREAD = 'put spread'
     RISKY = 'risk reversal'
+    STRANGLE = 'strangle'
+    FLY = 'fly'
 
     def __str__(self):
         return self.value
@@ -29,60 +32,222 @@ class Structure(enum.Enum):
                                  .format(self.name))
 
 
-class Option(object):
+# Legs of each structure as (strike position, 'call' or 'put', weight),
+# with strike positions in ascending strike order
+legs = {
+    Structure.CALL: ((0, 'call', 1),),
+    Structure.PUT: ((0, 'put', 1),),
+    Structure.COMBO: ((0, 'call', 1), (0, 'put', -1)),
+    Structure.STRADDLE: ((0, 'call', 1), (0, 'put', 1)),
+    Structure.CALLSPREAD: ((0, 'call', 1), (1, 'call', -1)),
+    Structure.PUTSPREAD: ((1, 'put', 1), (0, 'put', -1)),
+    Structure.RISKY: ((1, 'put', 1), (0, 'call', -1)),
+    Structure.STRANGLE: ((1, 'call', 1), (0, 'put', 1)),
+    Structure.FLY: ((0, 'call', 1), (1, 'call', -2), (2, 'call', 1)),
+}
+# Structures quoted as the absolute value of their legs
+absolute = {Structure.RISKY}
+# Structures long every leg: their prices rise with vol, so imply one
+vol_quoted = {structure for structure, structure_legs in legs.items()
+              if all(weight > 0 for _, _, weight in structure_legs)}
+leg_columns = ('call', 'put')
 
-    def __init__(self, strikes, structure, board):
-        if isinstance(strikes, int) or isinstance(strikes, np.int64):
-            self.strikes = [strikes]
-        else:
-            self.strikes = strikes
-        self.structure = structure
+
+def is_valid_strikes(structure, strikes):
+    # A fly's fixed 1/-2/1 weights need wings equally spaced about the body
+    if structure is Structure.FLY:
+        lo, mid, hi = strikes
+        return lo < mid < hi and math.isclose(mid - lo, hi - mid)
+    return True
+
+
+def strike_sets(structure, strikes):
+    """
+    Every ascending set of the given strikes that structure can trade on.
+    Flies are enumerated from body and wing width directly rather than
+    filtered from all triples
+    """
+    strikes = sorted(strikes)
+    if structure is not Structure.FLY:
+        return list(itertools.combinations(strikes, structure.num_strikes()))
+    n = len(strikes)
+    return [(strikes[i - w], strikes[i], strikes[i + w])
+            for i in range(1, n - 1)
+            for w in range(1, min(i, n - 1 - i) + 1)
+            if is_valid_strikes(structure, (strikes[i - w], strikes[i],
+                                            strikes[i + w]))]
+
+
+def structure_weights(options, strikes):
+    """
+    Matrix with one row of leg weights per option over the board strikes.
+    Columns are the calls at each strike followed by the puts, matching
+    Board.leg_values
+    """
+    import numpy as np
+    column = {strike: i for i, strike in enumerate(strikes)}
+    num_strikes = len(strikes)
+    weights = np.zeros((len(options), len(leg_columns) * num_strikes))
+    for row, option in enumerate(options):
+        if not is_valid_strikes(option.structure, option.strikes):
+            raise ValueError('Invalid strikes for structure: ',
+                             option.strikes, option.structure)
+        for pos, leg, weight in legs[option.structure]:
+            try:
+                col = column[option.strikes[pos]]
+            except KeyError:
+                raise KeyError('Strike not on board: ', option.strikes[pos])
+            weights[row, leg_columns.index(leg) * num_strikes + col] += weight
+    return weights
+
+
+class StructurePricer(object):
+    """
+    Fair values of many options on one board as a single matrix-vector
+    product of precomputed leg weights against the board's call and put
+    prices. The weights are rebuilt only when the board's strikes roll.
+    """
+
+    def __init__(self, options, board):
+        import numpy as np
+        self.options = list(options)
         self.board = board
+        self.df = None
+        self.vols = None
+        self.absolute = np.array([option.structure in absolute
+                                  for option in self.options], dtype=bool)
+
+    def weights(self):
+        # In-place board updates keep the same frame; a re-roll replaces it
+        board = self.board
+        if board.df is not self.df:
+            self.df = board.df
+            self.matrix = structure_weights(self.options,
+                                            board.df.index.tolist())
+        return self.matrix
+
+    def signs(self, prices):
+        # Absolute-quoted structures flip sign when their legs price < 0
+        import numpy as np
+        return np.where(self.absolute & (prices < 0), -1.0, 1.0)
+
+    def prices(self):
+        prices = self.weights() @ self.board.leg_values()
+        return self.signs(prices) * prices
+
+    def greeks(self):
+        """
+        Greeks of each option as an array of shape (options, 4), columns
+        in pricing.greek_names, aggregated from the board's per-leg Greeks
+        without repricing
+        """
+        weights = self.weights()
+        prices = weights @ self.board.leg_values()
+        greeks = weights @ self.board.leg_greeks()
+        return self.signs(prices)[:, None] * greeks
+
+    def position_greeks(self, sizes):
+        # Net Greeks of holding sizes[i] lots of each option
+        import numpy as np
+        return np.asarray(sizes, dtype=float) @ self.greeks()
+
+    def implied_vols(self, prices, guess=None):
+        """
+        Flat vol at which each option is worth prices[i], solved for all
+        options at once. Without a guess the last solve warm starts this
+        one, so a live set of quotes re-solves in a few iterations per
+        tick. NaN where no vol in range fits, e.g. for combos, whose price
+        does not depend on vol
+        """
+        import numpy as np
+        from pricing import black_scholes, solve_vol
+        board = self.board
+        weights = self.weights()
+        strikes = np.asarray(board.df.index, dtype=float)
+        prices = np.asarray(prices, dtype=float)
+        # Absolute-quoted prices carry the sign of the structure's legs
+        targets = self.signs(weights @ board.leg_values()) * prices
+
+        def value(sigma, index):
+            grid = black_scholes(float(board.S), strikes, sigma[:, None],
+                                 board.rate, board.expiry)
+            rows = weights[index]
+            legs = np.concatenate([grid.call, grid.put], axis=1)
+            vegas = np.concatenate([grid.vega, grid.vega], axis=1)
+            return (rows * legs).sum(axis=1), (rows * vegas).sum(axis=1)
+
+        if guess is None and self.vols is not None:
+            guess = self.vols
+        self.vols = solve_vol(value, targets, guess)
+        return self.vols
+
+
+class Option(Immutable):
+    __slots__ = ('_strikes', '_structure', '_board')
+    strikes = readonly('strikes')
+    structure = readonly('structure')
+    board = readonly('board')
+
+    def __init__(self, strikes, structure, board):
+        if isinstance(strikes, numbers.Integral):
+            strikes = [strikes]
+        self._strikes = tuple(strikes)
+        self._structure = structure
+        self._board = board
+
+    def _key(self):
+        return self._strikes, self._structure, id(self._board)
+
+    def __eq__(self, other):
+        if isinstance(other, Option):
+            return (self._strikes == other._strikes and
+                    self._structure is other._structure and
+                    self._board is other._board)
+        return NotImplemented
+
+    __hash__ = Immutable.__hash__
 
     @classmethod
-    def rand(cls, board=None):
-        struct = random.choice(list(Structure))
-        strikes = np.random.choice(board.get_strikes(),
-                                   size=struct.num_strikes(),
-                                   replace=False)
+    def rand(cls, board=None, rng=None):
+        # rng may be a numpy Generator, a seed, or None for fresh entropy
+        import numpy as np
+        rng = np.random.default_rng(rng)
+        structs = list(Structure)
+        struct = structs[rng.integers(len(structs))]
+        if struct is Structure.FLY:
+            sets = strike_sets(struct, board.get_strikes())
+            return cls(list(sets[rng.integers(len(sets))]), struct, board)
+        strikes = rng.choice(board.get_strikes(),
+                             size=struct.num_strikes(),
+                             replace=False)
         strikes = np.sort(strikes).tolist()
-        return Option(strikes, struct, board)
+        return cls(strikes, struct, board)
 
     def __repr__(self):
-        return str(self.strikes) + str(self.structure)
+        return str(list(self.strikes)) + str(self.structure)
 
     def __str__(self):
         strike_str = '/'.join(str(strike) for strike in self.strikes)
         return strike_str + ' ' + str(self.structure)
 
     def get_price(self):
-        board = self.board
-        strikes = self.strikes
-        structure = self.structure
-        df = board.df[board.df.index.isin(strikes)][['call', 'put']].copy()
-        df = df.reset_index(drop=True)
-        if structure is Structure.CALL:
-            px = float(df.call)
-        elif structure is Structure.PUT:
-            px = float(df.put)
-        elif structure is Structure.COMBO:
-            px = float(df.call - df.put)
-        elif structure is Structure.STRADDLE:
-            px = float(df.call + df.put)
-        elif structure is Structure.CALLSPREAD:
-            px = float(df.call[0] - df.call[1])
-        elif structure is Structure.PUTSPREAD:
-            px = float(df.put[1] - df.put[0])
-        elif structure is Structure.RISKY:
-            px = abs(float((df.put[1] - df.call[0])))
-        elif structure is Structure.STRANGLE:
-            px = float(df.call[1] + df.put[0])
-        else:
-            raise AttributeError('Unknown struct type: ', structure)
-        return Price(px)
+        return Price(float(StructurePricer([self], self.board).prices()[0]))
+
+    def get_implied_vol(self, price):
+        # Flat vol implied by a price for the whole structure
+        return float(StructurePricer([self], self.board)
+                     .implied_vols([float(price)])[0])
+
+    def get_greeks(self):
+        # Delta, gamma, vega and theta of the whole structure by name
+        from pricing import greek_names
+        greeks = StructurePricer([self], self.board).greeks()[0]
+        return dict(zip(greek_names, greeks.tolist()))
 
 
 if __name__ == '__main__':
-    struct = Option.rand()
+    from boards import PriceBoard
+    struct = Option.rand(PriceBoard())
     print(struct)
     print(struct.get_price())
+    print(struct.get_greeks())
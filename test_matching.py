@@ -0,0 +1,134 @@
+import unittest
+from matching import OrderBook
+from order_types import Direction
+
+BUY = Direction.BUY
+SELL = Direction.SELL
+
+
+class TestOrderBook(unittest.TestCase):
+
+    def setUp(self):
+        self.book = OrderBook()
+
+    def test_rests_when_not_crossed(self):
+        _, fills = self.book.add(BUY, 1.00, 10)
+        self.assertEqual(fills, [])
+        _, fills = self.book.add(SELL, 1.10, 10)
+        self.assertEqual(fills, [])
+        self.assertEqual(self.book.best_bid(), 1.00)
+        self.assertEqual(self.book.best_offer(), 1.10)
+
+    def test_crossing_fills_at_resting_price(self):
+        maker, _ = self.book.add(SELL, 5.70, 100)
+        taker, fills = self.book.add(BUY, 7.00, 100)
+        self.assertEqual(len(fills), 1)
+        fill = fills[0]
+        self.assertEqual((fill.price, fill.size), (5.70, 100))
+        self.assertEqual((fill.maker_id, fill.taker_id), (maker, taker))
+        self.assertIs(fill.taker_direction, BUY)
+        self.assertIsNone(self.book.best_offer())
+        self.assertIsNone(self.book.best_bid())
+
+    def test_price_priority(self):
+        worse, _ = self.book.add(SELL, 1.20, 10)
+        better, _ = self.book.add(SELL, 1.10, 10)
+        _, fills = self.book.add(BUY, 1.20, 15)
+        self.assertEqual([(f.maker_id, f.price, f.size) for f in fills],
+                         [(better, 1.10, 10), (worse, 1.20, 5)])
+
+    def test_time_priority(self):
+        first, _ = self.book.add(BUY, 1.00, 10)
+        second, _ = self.book.add(BUY, 1.00, 10)
+        _, fills = self.book.add(SELL, 1.00, 15)
+        self.assertEqual([(f.maker_id, f.size) for f in fills],
+                         [(first, 10), (second, 5)])
+        self.assertEqual(self.book.depth(BUY, 1.00), 5)
+
+    def test_partial_fill_rests_remainder(self):
+        self.book.add(SELL, 2.00, 30)
+        taker, fills = self.book.add(BUY, 2.00, 50)
+        self.assertEqual(sum(fill.size for fill in fills), 30)
+        self.assertIn(taker, self.book.orders)
+        self.assertEqual(self.book.best_bid(), 2.00)
+        self.assertEqual(self.book.depth(BUY, 2.00), 20)
+
+    def test_cancel(self):
+        order_id, _ = self.book.add(BUY, 1.00, 10)
+        self.assertEqual(self.book.cancel(order_id), 10)
+        self.assertIsNone(self.book.best_bid())
+        self.assertEqual(self.book.cancel(order_id), 0)
+        _, fills = self.book.add(SELL, 0.50, 10)
+        self.assertEqual(fills, [])
+
+    def test_cancel_keeps_other_orders_at_level(self):
+        first, _ = self.book.add(BUY, 1.00, 10)
+        second, _ = self.book.add(BUY, 1.00, 10)
+        self.book.cancel(first)
+        _, fills = self.book.add(SELL, 1.00, 10)
+        self.assertEqual([fill.maker_id for fill in fills], [second])
+
+    def test_modify_size_down_keeps_priority(self):
+        first, _ = self.book.add(BUY, 1.00, 10)
+        second, _ = self.book.add(BUY, 1.00, 10)
+        self.assertEqual(self.book.modify(first, size=5), (first, []))
+        _, fills = self.book.add(SELL, 1.00, 5)
+        self.assertEqual([fill.maker_id for fill in fills], [first])
+        self.assertNotIn(first, self.book.orders)
+        self.assertIn(second, self.book.orders)
+
+    def test_modify_price_loses_priority(self):
+        first, _ = self.book.add(BUY, 1.00, 10)
+        second, _ = self.book.add(BUY, 1.00, 10)
+        moved, _ = self.book.modify(first, price=1.00, size=20)
+        self.assertNotEqual(moved, first)
+        _, fills = self.book.add(SELL, 1.00, 10)
+        self.assertEqual([fill.maker_id for fill in fills], [second])
+
+    def test_modify_can_cross(self):
+        self.book.add(SELL, 1.10, 10)
+        order_id, _ = self.book.add(BUY, 1.00, 10)
+        _, fills = self.book.modify(order_id, price=1.10)
+        self.assertEqual([(fill.price, fill.size) for fill in fills],
+                         [(1.10, 10)])
+
+    def test_modify_unknown_order(self):
+        with self.assertRaises(KeyError):
+            self.book.modify(12345, size=1)
+
+    def test_iceberg_replenishes_at_back_of_level(self):
+        iceberg, _ = self.book.add(SELL, 1.00, 30, peak=10)
+        other, _ = self.book.add(SELL, 1.00, 10)
+        self.assertEqual(self.book.depth(SELL, 1.00), 20)
+        _, fills = self.book.add(BUY, 1.00, 15)
+        self.assertEqual([(f.maker_id, f.size) for f in fills],
+                         [(iceberg, 10), (other, 5)])
+        self.assertEqual(self.book.depth(SELL, 1.00), 15)
+
+    def test_market_order_does_not_rest(self):
+        self.book.add(SELL, 1.00, 10)
+        fills = self.book.market(BUY, 25)
+        self.assertEqual(sum(fill.size for fill in fills), 10)
+        self.assertIsNone(self.book.best_bid())
+
+
+class TestMarketBoardFills(unittest.TestCase):
+
+    def test_fills_reach_listeners(self):
+        from boards import MarketBoard
+        from order_types import Order
+        from structures import Option, Structure
+        board = MarketBoard()
+        option = Option(board.fair.get_strikes()[:2], Structure.CALLSPREAD,
+                        board.fair)
+        heard = []
+        board.fill_listeners.append(heard.extend)
+        self.assertEqual(board.append(Order(option, SELL, 5.70, 100)), [])
+        fills = board.append(Order(option, BUY, 7.00, 100))
+        self.assertEqual([(fill.price, fill.size) for fill in fills],
+                         [(5.70, 100)])
+        self.assertEqual(heard, fills)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+from concurrent.futures import ProcessPoolExecutor
+import collections
+import math
+import os
+import sys
+import time
+import numpy as np
+
+# Per-game statistics accumulated from each GameResult
+stat_names = ('pnl', 'fills', 'lots', 'edge', 'orders', 'crossed')
+
+
+class RunningStats(object):
+    """
+    Streaming count, mean, variance and range (Welford's algorithm).
+    Accumulators from separate workers combine exactly with merge, so
+    a tournament never holds more than one game result at a time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        return self
+
+    def merge(self, other):
+        # Chan et al. pairwise update of the combined moments
+        count = self.count + other.count
+        if count == 0:
+            return self
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def stderr(self):
+        if self.count == 0:
+            return math.nan
+        return self.std / math.sqrt(self.count)
+
+    def __str__(self):
+        return (f'{self.mean:>12.3f} +/- {self.stderr:<10.3f}'
+                f'[{self.min:.2f}, {self.max:.2f}]')
+
+
+def chunk_seeds(seed, num_chunks):
+    # Independent, reproducible seeds for each chunk of games
+    children = np.random.SeedSequence(seed).spawn(num_chunks)
+    return [int(child.generate_state(1)[0]) for child in children]
+
+
+def play_chunk(strategy, num_games, seed, configs, expiry):
+    """
+    Worker task: play num_games seeded games on a fresh board, built from
+    the pinned board settings and expiry, and return their statistics.
+    All randomness comes from the chunk's own seeded Generator, so a
+    chunk's results do not depend on which process runs it, in what
+    order, on what day or with what board.yml.
+    """
+    import settings
+    from boards import PriceBoard, PublicBoard
+    from simulation import Simulation
+    stats = {name: RunningStats() for name in stat_names}
+    with settings.board.overriding(**configs):
+        board = PublicBoard(PriceBoard(configs['stock'], expiry))
+        sim = Simulation(strategy, board=board, seed=seed)
+        for result in sim.run(num_games):
+            for name in stat_names:
+                stats[name].add(getattr(result, name))
+    return stats
+
+
+class Tournament(object):
+    """
+    Monte Carlo evaluation of strategies over many headless games, fanned
+    out across processes in fixed-size chunks. Chunk seeds derive from the
+    tournament seed and results are merged in chunk order, and the board
+    settings and expiry are pinned when the tournament is created, so
+    totals are identical for a given seed whatever the number of workers
+    or the day. Strategies must be picklable, i.e. module-level functions.
+    """
+    chunk_size = 500
+
+    def __init__(self, workers=None, seed=0, chunk_size=None, configs=None,
+                 expiry=None):
+        import settings
+        from expiries import years_to_expiry
+        self.workers = workers or os.cpu_count()
+        self.seed = seed
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+        # Board settings, overriding any of the current ones
+        self.configs = settings.board.snapshot()
+        self.configs.update(configs or {})
+        if expiry is None:
+            expiry = years_to_expiry()
+        self.expiry = expiry
+
+    def chunks(self, num_games):
+        sizes = [self.chunk_size] * (num_games // self.chunk_size)
+        if num_games % self.chunk_size:
+            sizes.append(num_games % self.chunk_size)
+        return sizes
+
+    def run(self, strategy, num_games):
+        # Aggregate statistics for one strategy over num_games games
+        sizes = self.chunks(num_games)
+        seeds = chunk_seeds(self.seed, len(sizes))
+        stats = {name: RunningStats() for name in stat_names}
+        # Keep a bounded number of chunks in flight and merge in order
+        window = 4 * self.workers
+        with ProcessPoolExecutor(self.workers) as executor:
+            pending = collections.deque()
+            tasks = iter(zip(sizes, seeds))
+            for size, seed in tasks:
+                pending.append(executor.submit(play_chunk, strategy, size,
+                                               seed, self.configs,
+                                               self.expiry))
+                if len(pending) >= window:
+                    self.merge(stats, pending.popleft().result())
+            while pending:
+                self.merge(stats, pending.popleft().result())
+        return stats
+
+    def merge(self, stats, chunk_stats):
+        for name in stat_names:
+            stats[name].merge(chunk_stats[name])
+
+    def compare(self, strategies, num_games):
+        # Statistics for each strategy over the same seeded games
+        return {strategy.__name__: self.run(strategy, num_games)
+                for strategy in strategies}
+
+
+if __name__ == '__main__':
+    from simulation import fair_market, pass_market
+    num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    tournament = Tournament()
+    for strategy in [fair_market, pass_market]:
+        start = time.perf_counter()
+        stats = tournament.run(strategy, num_games)
+        elapsed = time.perf_counter() - start
+        print(f'{strategy.__name__}: {num_games / elapsed:.0f} games/s '
+              f'on {tournament.workers} workers')
+        for name, stat in stats.items():
+            print(f'    {name:<10} {stat}')
@@ -1,9 +1,8 @@
 from markets import Market
 from currencies import Price
-from order_types import IcebergOrder
-from boards import PriceBoard
-import numpy as np
+from order_types import Direction, IcebergOrder
 from sounds import shout
+import math
 
 
 buywords = set(["buy", "bid", "long", "mine", "buying"])
@@ -20,6 +19,8 @@ def get_user_command():
         return 'show_fair'
     elif 'log' in cmdstr:
         return 'show_log'
+    elif 'pos' in cmdstr:
+        return 'show_position'
     elif any(word in cmdstr for word in exitwords):
         return 'exit'
     else:
@@ -27,30 +28,48 @@ def get_user_command():
         return None
 
 
+# Fixed phrases the game may shout, for audio prewarming
+phrases = ["Haha, okay... yours!", "Haha, okay... mine!"]
+
+
+def market_query(order):
+    return (f"Make me a market in "
+            f"{order.size} lots of "
+            f"the {order.option}:\n")
+
+
+def immediate_trade(market, fair):
+    # The player's side when their market is through fair, so is taken at once
+    if market.bid > fair:
+        return Direction.BUY
+    elif market.ask < fair:
+        return Direction.SELL
+    return None
+
+
 def get_user_market(order=None):
     """
-    Get a Market
+    Get a Market. A market through fair is traded immediately, and
+    immediate_trade gives the player's side of that trade
     """
     if order is None:
         order = IcebergOrder.rand()
     option = order.option
     fair = option.get_price()
-    query = (f"Make me a market in "
-             f"{order.size} lots of "
-             f"the {option}:\n")
+    query = market_query(order)
     shout(query)
     try:
         strmkt = input("")
         if strmkt:
             market = market_from_string(strmkt)
-            if market.bid > fair:
+            dirn = immediate_trade(market, fair)
+            if dirn is Direction.BUY:
                 shout("Haha, okay... yours!")
-            elif market.ask < fair:
+            elif dirn is Direction.SELL:
                 shout("Haha, okay... mine!")
-            else:
-                return market
+            return market
         else:
-            return Market(np.nan, np.nan)
+            return Market(math.nan, math.nan)
     except (ValueError, IOError) as e:
         print("Sorry, that doesn't look like a valid market")
         print(e)
@@ -60,7 +79,7 @@ def get_user_market(order=None):
 def market_from_string(strmkt):
     # Infer Market from a string
     if strmkt == '':
-        return Market(np.nan, np.nan)
+        return Market(math.nan, math.nan)
     bid, ask = strmkt.replace(" ", "").replace("-", "@").split("@")
     bid = float(bid)
     ask = float(ask)
@@ -79,6 +98,7 @@ def get_user_order():
 """
 
 if __name__ == "__main__":
+    from boards import PriceBoard
     board = PriceBoard()
     order = IcebergOrder.rand(board)
     print(board)